@@ -1,7 +1,8 @@
 # agents/crossover_agent.py
+import json
 from pydantic import BaseModel, Field
-from typing import Optional, Tuple
-from .llm_agent import LLMAgent
+from typing import List, Optional, Tuple
+from .llm_agent import LLMAgent, system_prompt_with_reference
 from ga.genome import Individual
 
 # --- Pydantic Output Model ---
@@ -18,14 +19,24 @@ class CrossoverOutput(BaseModel):
         description="The resulting topic for the child, either inherited or combined."
     )
 
-# --- System Prompt ---
-def _get_system_prompt() -> str:
+class BatchCrossoverOutput(BaseModel):
     """
-    Returns the system prompt for the Crossover Agent.
-    This prompt instructs the LLM to perform a semantic crossover,
-    choosing to either inherit or combine attributes.
+    Defines the JSON structure for a batched crossover: one result per
+    parent pair, in the same order as the pairs were given.
     """
-    return f"""
+    results: List[CrossoverOutput] = Field(
+        ...,
+        description="One crossover result per parent pair, in the order the pairs were listed."
+    )
+
+# Token budget per pair for the batched crossover output
+_BATCH_TOKENS_PER_PAIR = 96
+
+# --- System Prompt ---
+# Built once at import time; compact separators keep the prompt short
+_SCHEMA_JSON = json.dumps(CrossoverOutput.model_json_schema(), separators=(",", ":"))
+
+_SYSTEM_PROMPT = f"""
     You are an AI assistant specialized in genetic algorithms.
     Your task is to perform a semantic crossover between two parent individuals
     based on their relevance to a Reference Text.
@@ -43,30 +54,87 @@ def _get_system_prompt() -> str:
         perfectly aligned with the Reference Text.
 
     Your response MUST be a single JSON object conforming to the following schema:
-    {CrossoverOutput.model_json_schema()}
+    {_SCHEMA_JSON}
         """.strip()
 
-# --- User Prompt ---
-def _get_user_prompt(parent1: Individual, parent2: Individual, reference_text:str) -> str:
-    """
-    Returns the user prompt containing the genomes of the two parents
-    and Reference Text.
-    """
-    return f"""
-    Reference Text (Your anchor for all decisions):
-    "{reference_text}"
+_BATCH_SCHEMA_JSON = json.dumps(BatchCrossoverOutput.model_json_schema(), separators=(",", ":"))
+
+# Same task as above, applied to several parent pairs in a single call
+# so the instructions are only sent (and processed) once per batch.
+_BATCH_SYSTEM_PROMPT = f"""
+    You are an AI assistant specialized in genetic algorithms.
+    Your task is to perform a semantic crossover on SEVERAL independent
+    pairs of parent individuals, based on their relevance to a Reference Text.
+
+    You will receive the Reference Text and a numbered list of parent pairs,
+    each with the Role and Topic of both parents. For every pair, generate
+    a new Role and Topic for a child that is highly coherent with the
+    Reference Text.
+
+    For each attribute (Role and Topic), you have two options:
+    1.  Inherit: Analyze both parent attributes and the Reference Text.
+        Choose the attribute (from Parent 1 or 2) that is semantically stronger
+        and more relevant to the Reference Text.
+    2.  Combine: If both attributes are strong and relevant, create a
+        new attribute that fuses their ideas in a way that is still
+        perfectly aligned with the Reference Text.
+
+    Treat each pair independently. Return exactly one result per pair,
+    in the same order as the pairs are listed.
+
+    Your response MUST be a single JSON object conforming to the following schema:
+    {_BATCH_SCHEMA_JSON}
+        """.strip()
 
+# --- User Prompt ---
+# The Reference Text lives in the system prompt; these only carry the parents.
+_USER_TEMPLATE = """
     Parent 1:
-    - Role: "{parent1['role']}"
-    - Topic: "{parent1['topic']}"
+    - Role: "{r1}"
+    - Topic: "{t1}"
 
     Parent 2:
-    - Role: "{parent2['role']}"
-    - Topic: "{parent2['topic']}"
+    - Role: "{r2}"
+    - Topic: "{t2}"
 
     Perform the semantic crossover based on relevance to the Reference Text.
         """.strip()
 
+_BATCH_PAIR_TEMPLATE = (
+    '    Pair {i}:\n'
+    '    - Parent 1: Role: "{r1}" | Topic: "{t1}"\n'
+    '    - Parent 2: Role: "{r2}" | Topic: "{t2}"'
+)
+
+_BATCH_USER_TEMPLATE = """
+{pair_blocks}
+
+    Perform the semantic crossover for all {n_pairs} pairs based on relevance to the Reference Text.
+        """.strip()
+
+def _get_user_prompt(parent1: Individual, parent2: Individual) -> str:
+    """
+    Returns the user prompt containing the genomes of the two parents.
+    """
+    return _USER_TEMPLATE.format_map({
+        "r1": parent1['role'], "t1": parent1['topic'],
+        "r2": parent2['role'], "t2": parent2['topic'],
+    })
+
+def _get_batch_user_prompt(pairs: List[Tuple[Individual, Individual]]) -> str:
+    """
+    Returns the user prompt enumerating every parent pair of the batch.
+    """
+    pair_blocks = "\n\n".join(
+        _BATCH_PAIR_TEMPLATE.format_map({
+            "i": i,
+            "r1": p1['role'], "t1": p1['topic'],
+            "r2": p2['role'], "t2": p2['topic'],
+        })
+        for i, (p1, p2) in enumerate(pairs, start=1)
+    )
+    return _BATCH_USER_TEMPLATE.format_map({"pair_blocks": pair_blocks, "n_pairs": len(pairs)})
+
 # --- Main Agent Function ---
 async def semantic_crossover(
     parent1: Individual,
@@ -79,8 +147,8 @@ async def semantic_crossover(
     Performs semantic crossover on two parent individuals.
     Returns a tuple (new_role, new_topic) or None on failure.
     """
-    system_prompt = _get_system_prompt()
-    user_prompt = _get_user_prompt(parent1, parent2, reference_text)
+    system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT, reference_text)
+    user_prompt = _get_user_prompt(parent1, parent2)
 
     response_obj = await llm_agent.call_llm(
         system_prompt=system_prompt,
@@ -92,4 +160,33 @@ async def semantic_crossover(
     if isinstance(response_obj, CrossoverOutput):
         return response_obj.new_role, response_obj.new_topic
     
-    return None
\ No newline at end of file
+    return None
+
+async def semantic_crossover_batch(
+    pairs: List[Tuple[Individual, Individual]],
+    reference_text: str,
+    llm_agent: LLMAgent,
+    temperature: float = 0.7
+) -> List[Optional[Tuple[str, str]]]:
+    """
+    Performs semantic crossover on several parent pairs with one LLM call.
+    Returns a list aligned with 'pairs'; an entry is None when the LLM
+    did not produce a result for that pair (the caller may retry it alone).
+    """
+    if not pairs:
+        return []
+
+    response_obj = await llm_agent.call_llm(
+        system_prompt=system_prompt_with_reference(_BATCH_SYSTEM_PROMPT, reference_text),
+        user_prompt=_get_batch_user_prompt(pairs),
+        output_model=BatchCrossoverOutput,
+        temperature=temperature,
+        max_tokens=_BATCH_TOKENS_PER_PAIR * len(pairs)
+    )
+
+    results: List[Optional[Tuple[str, str]]] = [None] * len(pairs)
+    if isinstance(response_obj, BatchCrossoverOutput):
+        for i, child in enumerate(response_obj.results[:len(pairs)]):
+            results[i] = (child.new_role, child.new_topic)
+
+    return results
\ No newline at end of file
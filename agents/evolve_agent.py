@@ -0,0 +1,131 @@
+# agents/evolve_agent.py
+import json
+from pydantic import BaseModel, Field
+from typing import Optional, Tuple
+from .llm_agent import LLMAgent, system_prompt_with_reference
+from ga.genome import Individual
+
+# --- Pydantic Output Model ---
+class EvolveOutput(BaseModel):
+    """
+    Defines the JSON structure for the EvolveAgent's output:
+    the child's final genome and its regenerated prompt.
+    """
+    role: str = Field(
+        ...,
+        description="The child's final role, after crossover and mutation."
+    )
+    topic: str = Field(
+        ...,
+        description="The child's final topic, after crossover and mutation."
+    )
+    prompt: str = Field(
+        ...,
+        description="The new, high-quality instruction (prompt) generated from the final role and topic."
+    )
+
+# --- System Prompts ---
+_SCHEMA_JSON = json.dumps(EvolveOutput.model_json_schema(), separators=(",", ":"))
+
+# Crossover + mutation + prompt regeneration as Chain-of-Thought steps of a
+# single call. Step 2 comes in the same two modes as the MutationAgent.
+_SYSTEM_PROMPT_TEMPLATE = """
+    You are an AI assistant specialized in genetic algorithms and an expert
+    prompt engineer. Your task is to create a child individual from two
+    parents, based on their relevance to a Reference Text.
+    You must follow this internal reasoning process:
+
+    1.  Combine Parents (Semantic Crossover): For each attribute (Role and Topic),
+        either inherit the parent attribute that is semantically stronger and
+        more relevant to the Reference Text, or, if both are strong, create a
+        new attribute that fuses their ideas while staying aligned with the
+        Reference Text.
+    2.  Mutate: Apply a semantic mutation to the attribute you are told to mutate.
+        {mutation_instructions}
+    3.  Write Prompt: Using the final Role and Topic, write a single, high-quality
+        instruction (prompt) that is perfectly aligned with the Role, Topic and
+        Reference Text, and guides another LLM to generate a short, 1-2 sentence text.
+
+    Your response MUST be a single JSON object conforming to the following schema:
+    {schema}
+        """
+
+# Mode 1: Re-conceptualization (Refinement)
+_SYSTEM_PROMPT_REFINE = _SYSTEM_PROMPT_TEMPLATE.format_map({
+    "mutation_instructions": (
+        "Suggest a slightly different, improved version of it that keeps the\n"
+        "        main intent and remains relevant to the context."
+    ),
+    "schema": _SCHEMA_JSON,
+}).strip()
+
+# Mode 2: Creative Leap (Exploration)
+_SYSTEM_PROMPT_EXPLORE = _SYSTEM_PROMPT_TEMPLATE.format_map({
+    "mutation_instructions": (
+        "Suggest a significantly different and creative alternative that explores\n"
+        "        a new concept, but is still relevant to the context."
+    ),
+    "schema": _SCHEMA_JSON,
+}).strip()
+
+# --- User Prompt ---
+_USER_TEMPLATE = """
+    Parent 1:
+    - Role: "{r1}"
+    - Topic: "{t1}"
+
+    Parent 2:
+    - Role: "{r2}"
+    - Topic: "{t2}"
+
+    Attribute to mutate: {attribute_to_mutate}
+
+    Create the child's Role, Topic and Prompt based on relevance to the Reference Text.
+        """.strip()
+
+def _get_user_prompt(parent1: Individual, parent2: Individual, attribute_to_mutate: str) -> str:
+    """
+    Returns the user prompt containing the genomes of the two parents
+    and the attribute selected for mutation.
+    """
+    return _USER_TEMPLATE.format_map({
+        "r1": parent1['role'], "t1": parent1['topic'],
+        "r2": parent2['role'], "t2": parent2['topic'],
+        "attribute_to_mutate": attribute_to_mutate,
+    })
+
+# --- Main Agent Function ---
+async def evolve_genome(
+    parent1: Individual,
+    parent2: Individual,
+    attribute_to_mutate: str,
+    reference_text: str,
+    llm_agent: LLMAgent,
+    is_stuck: bool,
+    temperature: float = 0.8
+) -> Optional[Tuple[str, str, str]]:
+    """
+    Performs crossover, mutation (of 'attribute_to_mutate': "role" or
+    "topic") and prompt regeneration in one LLM call.
+    Returns a tuple (new_role, new_topic, new_prompt) or None on failure.
+    """
+    if is_stuck:
+        system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT_EXPLORE, reference_text)
+    else:
+        system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT_REFINE, reference_text)
+
+    response_obj = await llm_agent.call_llm(
+        system_prompt=system_prompt,
+        user_prompt=_get_user_prompt(parent1, parent2, attribute_to_mutate),
+        output_model=EvolveOutput,
+        temperature=temperature
+    )
+
+    if isinstance(response_obj, EvolveOutput):
+        new_role = response_obj.role.strip()
+        new_topic = response_obj.topic.strip()
+        new_prompt = response_obj.prompt.strip()
+        if new_role and new_topic and new_prompt:
+            return new_role, new_topic, new_prompt
+
+    return None
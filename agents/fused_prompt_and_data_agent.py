@@ -0,0 +1,89 @@
+# agents/fused_prompt_and_data_agent.py
+import json
+from pydantic import BaseModel, Field
+from typing import Optional, Tuple
+from .llm_agent import LLMAgent, system_prompt_with_reference
+
+# --- Pydantic Output Model ---
+class FusedOutput(BaseModel):
+    """
+    Defines the JSON structure for the FusedPromptAndDataAgent's output.
+    It contains the regenerated prompt and the text produced by following it.
+    """
+    prompt: str = Field(
+        ...,
+        description="The new, high-quality instruction (prompt) generated from the evolved role and topic."
+    )
+    generated_text: str = Field(
+        ...,
+        description="The single, high-quality, short output text that fulfills the instruction."
+    )
+
+# --- System Prompt ---
+_SCHEMA_JSON = json.dumps(FusedOutput.model_json_schema(), separators=(",", ":"))
+
+# Prompt regeneration + data generation in a single call (one prefill
+# instead of two for the last stages of the child pipeline).
+_SYSTEM_PROMPT = f"""
+    You are an expert prompt engineer and an AI text generator.
+    Given a Role, a Topic and a Reference Text, you must follow this process:
+
+    1.  Write Prompt: Write a single, high-quality instruction (prompt) that is
+        perfectly aligned with the Role, Topic and Reference Text, and that
+        guides an LLM to generate a short, 1-2 sentence text.
+    2.  Execute Prompt: Follow that instruction yourself and generate the
+        single, high-quality, concise output text it asks for.
+
+    CRITICAL RULES for the output text:
+    1.  The output text MUST be text-only.
+    2.  The output text MUST be short (1-2 sentences).
+    3.  The output MUST NOT contain emojis, hashtags, URLs, or any other non-text social media artifacts.
+
+    Your response MUST be a single JSON object conforming to the following schema:
+    {_SCHEMA_JSON}
+        """.strip()
+
+# --- User Prompt ---
+_USER_TEMPLATE = """
+    - Role: "{role}"
+    - Topic: "{topic}"
+
+    Write the instruction (prompt) for these components and the Reference Text, then generate its output text.
+        """.strip()
+
+def _get_user_prompt(role: str, topic: str) -> str:
+    """
+    Returns the user prompt containing the evolved genome.
+    """
+    return _USER_TEMPLATE.format_map({"role": role, "topic": topic})
+
+# --- Main Agent Function ---
+async def fused_generate(
+    role: str,
+    topic: str,
+    reference_text: str,
+    llm_agent: LLMAgent,
+    temperature: float = 0.7
+) -> Optional[Tuple[str, str]]:
+    """
+    Regenerates the prompt for an evolved role and topic and generates
+    its data in one LLM call.
+    Returns a tuple (prompt, generated_text) or None on failure.
+    """
+    system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT, reference_text)
+    user_prompt = _get_user_prompt(role, topic)
+
+    response_obj = await llm_agent.call_llm(
+        system_prompt=system_prompt,
+        user_prompt=user_prompt,
+        output_model=FusedOutput,
+        temperature=temperature
+    )
+
+    if isinstance(response_obj, FusedOutput):
+        prompt = response_obj.prompt.strip()
+        generated_text = response_obj.generated_text.strip()
+        if prompt and generated_text:
+            return prompt, generated_text
+
+    return None
@@ -1,7 +1,8 @@
 # agents/generate_data_agent.py
+import json
 from pydantic import BaseModel, Field
 from typing import Optional
-from .llm_agent import LLMAgent
+from .llm_agent import LLMAgent, system_prompt_with_reference
 from ga.genome import Individual
 
 # --- Pydantic Output Model ---
@@ -15,12 +16,9 @@ class DataOutput(BaseModel):
     )
 
 # --- System Prompt ---
-def _get_system_prompt() -> str:
-    """
-    Returns the system prompt for the Generate Data Agent.
-    This prompt instructs the LLM to act as the final text generator.
-    """
-    return f"""
+_SCHEMA_JSON = json.dumps(DataOutput.model_json_schema(), separators=(",", ":"))
+
+_SYSTEM_PROMPT = f"""
     You are an AI text generator. Your task is to generate a single,
     high-quality, concise output (1-2 sentences maximum) that fulfills the instruction given in
     the Prompt.
@@ -34,26 +32,28 @@ def _get_system_prompt() -> str:
     3.  The output MUST NOT contain emojis, hashtags, URLs, or any other non-text social media artifacts.
 
     Your response MUST be a JSON object conforming to the following schema:
-    {DataOutput.model_json_schema()}
+    {_SCHEMA_JSON}
         """.strip()
 
 # --- User Prompt ---
-def _get_user_prompt(individual: Individual, reference_text: str) -> str:
-    """
-    Returns the user prompt containing all context from the individual.
-    """
-    return f"""
+_USER_TEMPLATE = """
     Context:
-    - Reference Text: "{reference_text}"
-    - Role: "{individual['role']}"
-    - Topic: "{individual['topic']}"
+    - Role: "{role}"
+    - Topic: "{topic}"
 
     Instruction:
-    - Prompt: "{individual['prompt']}"
+    - Prompt: "{prompt}"
 
     Generate the data based on the instruction.
         """.strip()
 
+def _get_user_prompt(individual: Individual) -> str:
+    """
+    Returns the user prompt containing all context from the individual.
+    (The Reference Text is part of the system prompt.)
+    """
+    return _USER_TEMPLATE.format_map(individual)
+
 # --- Main Agent Function ---
 async def generate_data_for_individual(
     individual: Individual,
@@ -64,8 +64,8 @@ async def generate_data_for_individual(
     """
     Generates the synthetic data for a single individual using its prompt.
     """
-    system_prompt = _get_system_prompt()
-    user_prompt = _get_user_prompt(individual, reference_text)
+    system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT, reference_text)
+    user_prompt = _get_user_prompt(individual)
 
     # Call the generic LLM agent and expect a DataOutput object
     response_obj = await llm_agent.call_llm(
@@ -1,59 +1,347 @@
 # agents/llm_agent.py
+import asyncio
+import hashlib
+import logging
+import random
+import sqlite3
+import threading
 import ollama
-from typing import Optional, Type
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Type
 import httpx
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from pydantic_core import SchemaValidator
+
+logger = logging.getLogger(__name__)
+
+# How long Ollama keeps the model (and the KV cache of the shared system
+# prompt prefix) loaded between requests. The server default of 5 minutes
+# can expire during long fitness evaluations or between irace trials.
+KEEP_ALIVE = "30m"
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+
+# Upper bound on generated tokens per call. Agents emit a few short JSON
+# fields, so this only cuts off runaway generations (bounded tail latency).
+# Callers with larger outputs (e.g. batched operators) pass their own bound.
+NUM_PREDICT = 256
+
+# Retry policy for a single call_llm request. A failed call makes the GA
+# discard the whole child, including the LLM calls that already succeeded.
+MAX_RETRIES = 2
+RETRY_BASE_DELAY = 0.2 # Seconds; doubled on every transient failure
+
+_RETRY_TEMPLATE = """
+{user_prompt}
+
+Your previous output failed validation:
+{content}
+
+Errors: {errors}
+Please re-emit a single valid JSON object conforming to the schema.
+""".strip()
+
+@lru_cache(maxsize=None)
+def _validator(output_model: Type[BaseModel]) -> SchemaValidator:
+    """
+    Returns the compiled pydantic-core validator of an output model.
+    Calling it directly skips the model_validate_json Python wrapper.
+    """
+    return output_model.__pydantic_validator__
+
+@lru_cache(maxsize=64)
+def system_prompt_with_reference(system_prompt: str, reference_text: str) -> str:
+    """
+    Appends the Reference Text to an agent's static system prompt.
+
+    The reference text is constant for a whole run, so keeping it in the
+    system message makes the entire prefix byte-identical across calls
+    (and cacheable by Ollama); user prompts only carry per-call data.
+    """
+    return f'{system_prompt}\n\nReference Text (Your anchor for all decisions):\n"{reference_text}"'
+
+@lru_cache(maxsize=None)
+def _schema_for(output_model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Returns the (memoized) JSON schema of an output model.
+    Ollama uses it to constrain decoding to schema-valid JSON.
+    """
+    return output_model.model_json_schema()
 
 class LLMAgent:
     """
     Centralized asynchronous class to handle all interactions with the LLM model.
     """
-    def __init__(self, model: str = "llama3"):
+    def __init__(
+        self,
+        model: str = "llama3",
+        hosts: Optional[List[str]] = None,
+        max_retries: int = MAX_RETRIES
+    ):
         # Configure the LLM model to use
         self.model = model
 
+        # Extra attempts per call before giving up on it
+        self.max_retries = max_retries
+
         # Set a longer timeout for LLM calls
         timeout = httpx.Timeout(120.0, connect=30.0)
 
-        # Initialize the Ollama async client
-        self.client = ollama.AsyncClient(host='http://127.0.0.1:11434', timeout=timeout)
-    
+        # Keep a pool of warm keep-alive connections large enough for all
+        # concurrent children, so calls do not pay a new TCP handshake
+        limits = httpx.Limits(
+            max_connections=128,
+            max_keepalive_connections=128,
+            keepalive_expiry=300.0
+        )
+
+        # Initialize one Ollama async client per server (extra kwargs go to
+        # httpx.AsyncClient). Requests are spread across them by load.
+        self.hosts = list(hosts) if hosts else [DEFAULT_HOST]
+        self.clients = [
+            ollama.AsyncClient(host=host, timeout=timeout, limits=limits)
+            for host in self.hosts
+        ]
+        self._in_flight = [0] * len(self.clients)
+        self._next = 0
+
+    async def aclose(self) -> None:
+        """
+        Closes the pooled HTTP connections of every client.
+        The agent must not be used afterwards.
+        """
+        # ollama.AsyncClient exposes no close method; its httpx client does
+        await asyncio.gather(*(client._client.aclose() for client in self.clients))
+
+    def _pick_client(self) -> int:
+        """
+        Returns the index of the client with the fewest requests in flight.
+        Ties are broken round-robin so idle servers share the load evenly.
+        """
+        n = len(self.clients)
+        start = self._next
+        self._next = (start + 1) % n
+        return min(
+            ((start + offset) % n for offset in range(n)),
+            key=lambda i: self._in_flight[i]
+        )
+
+    def _cache_key(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        output_model: Type[BaseModel],
+        temperature: float
+    ) -> str:
+        """
+        Returns a compact hash identifying one LLM request.
+        """
+        raw = f"{self.model}|{system_prompt}|{user_prompt}|{temperature:.2f}|{output_model.__name__}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
     async def call_llm(
-        self, 
+        self,
         system_prompt: str,
         user_prompt: str,
         output_model: Type[BaseModel], # The specific agent tells us what Pydantic model to expect
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        max_tokens: int = NUM_PREDICT
     ) -> Optional[BaseModel]:
         """
-        Generic method to call the LLM, force JSON output, and validate the output.
-        """
-        try:
-            response = await self.client.chat(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                format="json",
-                options={"temperature": temperature}
+        Generic method to call the LLM, force schema-conforming JSON output,
+        and validate the output.
+        """
+        attempt_prompt = user_prompt
+        for attempt in range(self.max_retries + 1):
+            client_idx = self._pick_client()
+            self._in_flight[client_idx] += 1
+            try:
+                response = await self.clients[client_idx].chat(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": attempt_prompt}
+                    ],
+                    format=_schema_for(output_model),
+                    options={"temperature": temperature, "num_predict": max_tokens},
+                    keep_alive=KEEP_ALIVE
+                )
+
+                # Decoding is schema-constrained, so this is a cheap sanity check
+                content = response["message"]["content"]
+                return _validator(output_model).validate_json(content)
+
+            except ValidationError as e:
+                # Schema failure: retry at once, showing the model what went wrong
+                attempt_prompt = _RETRY_TEMPLATE.format_map({
+                    "user_prompt": user_prompt,
+                    "content": content,
+                    "errors": e.errors(include_url=False, include_input=False),
+                })
+
+            except (httpx.TransportError, ConnectionError, ollama.ResponseError) as e:
+                # Network blips, timeouts and server-side errors are transient;
+                # anything else (e.g. unknown model) will not fix itself.
+                # ollama re-raises a refused connection as a builtin ConnectionError.
+                if isinstance(e, ollama.ResponseError) and e.status_code < 500 and e.status_code != 429:
+                    logger.error("LLMAgent request rejected for %s: %s", output_model.__name__, e)
+                    return None
+                if attempt < self.max_retries:
+                    await asyncio.sleep(RETRY_BASE_DELAY * 2 ** attempt + random.random() * 0.1)
+
+            except Exception:
+                logger.exception("LLMAgent failure for %s", output_model.__name__)
+                return None
+
+            finally:
+                self._in_flight[client_idx] -= 1
+
+        logger.warning(
+            "LLMAgent gave up on %s after %d attempts", output_model.__name__, self.max_retries + 1
+        )
+        return None # Retries exhausted
+
+class CachingLLMAgent(LLMAgent):
+    """
+    LLMAgent that persists validated responses in an on-disk SQLite cache.
+
+    Every request is keyed by (model, system prompt, user prompt, temperature,
+    output model) plus a sample index: the n-th identical request of a run
+    gets the n-th stored sample. Repeated calls within a run therefore stay
+    independent samples, while a re-run (or a retry after a crash) replays
+    the same sequence of responses instead of querying Ollama again.
+    """
+    def __init__(
+        self,
+        cache_path: Path,
+        model: str = "llama3",
+        hosts: Optional[List[str]] = None,
+        max_retries: int = MAX_RETRIES
+    ):
+        super().__init__(model=model, hosts=hosts, max_retries=max_retries)
+
+        # Autocommit + WAL, so parallel runs can share one cache file. The
+        # connection is used from worker threads (never on the event loop,
+        # where a locked database would stall every in-flight call), one
+        # statement at a time.
+        cache_path = Path(cache_path)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(cache_path, isolation_level=None, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT NOT NULL, sample INTEGER NOT NULL, content TEXT NOT NULL, "
+            "PRIMARY KEY (key, sample))"
+        )
+
+        # Samples handed out so far in this run, per request key
+        self._samples: Counter = Counter()
+
+    async def aclose(self) -> None:
+        """
+        Closes the HTTP connections and the cache database.
+        """
+        await super().aclose()
+        await asyncio.to_thread(self._db_close)
+
+    # Database operations: blocking, so they run in worker threads
+
+    def _db_close(self) -> None:
+        """
+        Closes the cache database once no operation is running on it.
+        """
+        with self._db_lock:
+            self._db.close()
+
+    def _db_get(self, key: str, sample: int) -> Optional[str]:
+        """
+        Returns the stored content of one sample of a request, if any.
+        """
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT content FROM responses WHERE key = ? AND sample = ?", (key, sample)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def _db_put(self, key: str, sample: int, content: str) -> None:
+        """
+        Stores the content of one sample of a request.
+        """
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, sample, content) VALUES (?, ?, ?)",
+                (key, sample, content)
             )
-            
-            content = response["message"]["content"]
-
-            # Validate the JSON string returned bt the LLM
-            if isinstance(content, str):
-                return output_model.model_validate_json(content)
-            
-            # Sometimes it might return a dict directly
-            if isinstance(content, dict):
-                return output_model.model_validate(content)
-            
-            raise ValueError("Unexpected response type from LLM (not str or dict)")
-
-        except Exception as e:
-            # Generic error logging
-            # print(f"❌ Error in LLMAgent.call_llm (Model: {output_model.__name__}): {e}")
-            # print(f"   Input System Prompt: {system_prompt[:100]}...")
-            # print(f"   Input User Prompt: {user_prompt[:100]}...")
-            return None
\ No newline at end of file
+
+    async def call_llm(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        output_model: Type[BaseModel],
+        temperature: float = 0.7,
+        max_tokens: int = NUM_PREDICT
+    ) -> Optional[BaseModel]:
+        """
+        Same contract as LLMAgent.call_llm, served from the disk cache when
+        this sample of the request was already stored.
+        """
+        key = self._cache_key(system_prompt, user_prompt, output_model, temperature)
+
+        # Deterministic requests have a single sample
+        sample = 0
+        if temperature > 0.0:
+            sample = self._samples[key]
+            self._samples[key] += 1
+
+        content = await asyncio.to_thread(self._db_get, key, sample)
+        if content is not None:
+            try:
+                return _validator(output_model).validate_json(content)
+            except ValidationError:
+                pass # Stale entry (output model changed): query again
+
+        result = await super().call_llm(
+            system_prompt, user_prompt, output_model, temperature, max_tokens
+        )
+        if result is not None:
+            await asyncio.to_thread(self._db_put, key, sample, result.model_dump_json())
+        return result
+
+# Process-wide agents, keyed by (model, hosts, cache_path)
+_SHARED_AGENTS: Dict[Tuple[str, Optional[Tuple[str, ...]], Optional[Path]], LLMAgent] = {}
+
+def get_shared_agent(
+    model: str = "llama3",
+    hosts: Optional[Tuple[str, ...]] = None,
+    cache_path: Optional[Path] = None
+) -> LLMAgent:
+    """
+    Returns the process-wide LLMAgent for a model (and set of servers).
+    Runs that share a process (e.g. parameter sweeps) then also share the
+    HTTP connection pools.
+    The pooled connections belong to one event loop, so all runs using a
+    shared agent must run inside the same loop.
+    With a 'cache_path', responses are also cached (and shared) on disk.
+    """
+    key = (model, hosts, cache_path)
+    agent = _SHARED_AGENTS.get(key)
+    if agent is None:
+        host_list = list(hosts) if hosts else None
+        if cache_path is not None:
+            agent = CachingLLMAgent(cache_path, model=model, hosts=host_list)
+        else:
+            agent = LLMAgent(model=model, hosts=host_list)
+        _SHARED_AGENTS[key] = agent
+    return agent
+
+async def close_shared_agents() -> None:
+    """
+    Closes every agent handed out by get_shared_agent. Call it once at
+    shutdown, from the event loop that used them.
+    """
+    agents = list(_SHARED_AGENTS.values())
+    _SHARED_AGENTS.clear()
+    await asyncio.gather(*(agent.aclose() for agent in agents))
@@ -1,8 +1,9 @@
 # agents/mutation_agent.py
+import json
 from pydantic import BaseModel, Field
 from typing import Optional, Tuple
 import random
-from .llm_agent import LLMAgent
+from .llm_agent import LLMAgent, system_prompt_with_reference
 from ga.genome import Individual
 
 # --- Pydantic Output Model ---
@@ -17,12 +18,11 @@ class MutationOutput(BaseModel):
     )
 
 # --- System Prompts ---
-def _get_system_prompt_refine() -> str:
-    """
-    Returns the system prompt for Mode 1: Re-conceptualization (Refinement).
-    This mode explores the local neighborhood of the solution.
-    """
-    return f"""
+_SCHEMA_JSON = json.dumps(MutationOutput.model_json_schema(), separators=(",", ":"))
+
+# Mode 1: Re-conceptualization (Refinement).
+# This mode explores the local neighborhood of the solution.
+_SYSTEM_PROMPT_REFINE = f"""
     You are an AI assistant specialized in genetic algorithms. Your
     task is to perform a semantic mutation via Re-conceptualization.
 
@@ -31,16 +31,13 @@ def _get_system_prompt_refine() -> str:
     remain relevant to the provided context.
 
     Your response MUST be a single JSON object conforming to the following schema:
-    {MutationOutput.model_json_schema()}
+    {_SCHEMA_JSON}
         """.strip()
 
-def _get_system_prompt_explore() -> str:
-    """
-    Returns the system prompt for Mode 2: Creative Leap (Exploration).
-    This mode jumps to a new area of the solution space to escape
-    local optima when the population is stuck.
-    """
-    return f"""
+# Mode 2: Creative Leap (Exploration).
+# This mode jumps to a new area of the solution space to escape
+# local optima when the population is stuck.
+_SYSTEM_PROMPT_EXPLORE = f"""
     You are an AI assistant specialized in genetic algorithms. Your
     task is to perform a semantic mutation via Creative Leap.
 
@@ -49,12 +46,19 @@ def _get_system_prompt_explore() -> str:
     concept, but must still be relevant to the provided context.
 
     Your response MUST be a single JSON object conforming to the following schema:
-    {MutationOutput.model_json_schema()}
+    {_SCHEMA_JSON}
         """.strip()
 
 # --- User Prompt ---
+_USER_TEMPLATE = """
+    Context:
+    - (Context Anchor) {context_attribute}: "{context_value}"
+
+    Task:
+    Mutate this {attribute_to_mutate}: "{value_to_mutate}"
+        """.strip()
+
 def _get_user_prompt(
-    reference_text: str,
     attribute_to_mutate: str,
     value_to_mutate: str,
     context_attribute: str,
@@ -62,17 +66,15 @@ def _get_user_prompt(
 ) -> str:
     """
     Returns the user prompt for mutation.
-    It includes the reference text and the other attribute
-    as contextual anchors to keep the mutation relevant.
+    It includes the other attribute as a contextual anchor to keep the
+    mutation relevant (the reference text is part of the system prompt).
     """
-    return f"""
-    Context:
-    - Reference Text: "{reference_text}"
-    - (Context Anchor) {context_attribute}: "{context_value}"
-
-    Task:
-    Mutate this {attribute_to_mutate}: "{value_to_mutate}"
-        """.strip()
+    return _USER_TEMPLATE.format_map({
+        "attribute_to_mutate": attribute_to_mutate,
+        "value_to_mutate": value_to_mutate,
+        "context_attribute": context_attribute,
+        "context_value": context_value,
+    })
 
 # --- Main Agent Function ---
 async def semantic_mutation(
@@ -101,13 +103,12 @@ async def semantic_mutation(
 
     # 2. Select the system prompt based on the 'is_stuck' flag
     if is_stuck:
-        system_prompt = _get_system_prompt_explore()
+        system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT_EXPLORE, reference_text)
     else:
-        system_prompt = _get_system_prompt_refine()
+        system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT_REFINE, reference_text)
         
     # 3. Create the user prompt
     user_prompt = _get_user_prompt(
-        reference_text=reference_text,
         attribute_to_mutate=attribute_to_mutate,
         value_to_mutate=value_to_mutate,
         context_attribute=context_attribute,
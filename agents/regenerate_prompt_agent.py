@@ -1,7 +1,8 @@
 # agents/regenerate_prompt_agent.py
+import json
 from pydantic import BaseModel, Field
 from typing import Optional
-from .llm_agent import LLMAgent
+from .llm_agent import LLMAgent, system_prompt_with_reference
 
 # --- Pydantic Output Model ---
 class RegeneratePromptOutput(BaseModel):
@@ -14,13 +15,9 @@ class RegeneratePromptOutput(BaseModel):
     )
 
 # --- System Prompt ---
-def _get_system_prompt() -> str:
-    """
-    Returns the system prompt for the Regenerate Prompt Agent.
-    This prompt instructs the LLM to build a new prompt from
-    the evolved genome.
-    """
-    return f"""
+_SCHEMA_JSON = json.dumps(RegeneratePromptOutput.model_json_schema(), separators=(",", ":"))
+
+_SYSTEM_PROMPT = f"""
     You are an expert prompt engineer. Your task is to write a single,
     high-quality instruction (prompt) based on a given Role, Topic,
     and Reference Text.
@@ -29,23 +26,23 @@ def _get_system_prompt() -> str:
     guide another LLM to generate a short, 1-2 sentence text.
 
     Your response MUST be a JSON object conforming to the following schema:
-    {RegeneratePromptOutput.model_json_schema()}
+    {_SCHEMA_JSON}
         """.strip()
 
 # --- User Prompt ---
-def _get_user_prompt(role: str, topic: str, reference_text: str) -> str:
-    """
-    Returns the user prompt containing the evolved genome
-    and the reference text.
-    """
-    return f"""
-    - Reference Text: "{reference_text}"
+_USER_TEMPLATE = """
     - Role: "{role}"
     - Topic: "{topic}"
 
-    Generate the instruction (prompt) based on these components.
+    Generate the instruction (prompt) based on these components and the Reference Text.
         """.strip()
 
+def _get_user_prompt(role: str, topic: str) -> str:
+    """
+    Returns the user prompt containing the evolved genome.
+    """
+    return _USER_TEMPLATE.format_map({"role": role, "topic": topic})
+
 # --- Main Agent Function ---
 async def regenerate_prompt(
     role: str,
@@ -58,8 +55,8 @@ async def regenerate_prompt(
     Generates a new prompt from an evolved role and topic.
     Returns the new prompt string or None on failure.
     """
-    system_prompt = _get_system_prompt()
-    user_prompt = _get_user_prompt(role, topic, reference_text)
+    system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT, reference_text)
+    user_prompt = _get_user_prompt(role, topic)
 
     response_obj = await llm_agent.call_llm(
         system_prompt=system_prompt,
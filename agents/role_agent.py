@@ -1,7 +1,8 @@
 # agents/role_agent.py
+import json
 from pydantic import BaseModel, Field
 from typing import Optional
-from .llm_agent import LLMAgent
+from .llm_agent import LLMAgent, system_prompt_with_reference
 
 # --- Pydantic Output Model ---
 class RoleOutput(BaseModel):
@@ -14,25 +15,20 @@ class RoleOutput(BaseModel):
     )
 
 # --- System Prompt ---
-def _get_system_prompt() -> str:
-    """
-    Returns the system prompt for the Role Agent
-    """
-    return f"""
+_SCHEMA_JSON = json.dumps(RoleOutput.model_json_schema(), separators=(",", ":"))
+
+_SYSTEM_PROMPT = f"""
     You are an expert text analyst. Your task is to accurately infer the
     most likely role of the speaker given a short piece of text.
     Focus on the context, tone, and content to determine their perspective.
 
     Your response MUST be a JSON object conforming to the following schema:
-    {RoleOutput.model_json_schema()}
+    {_SCHEMA_JSON}
         """.strip()
 
 # --- User Prompt ---
-def _get_user_prompt(reference_text: str) -> str:
-    """
-    Returns the user prompt containing the reference text
-    """
-    return f"Reference Text: \"{reference_text}\"\n\nInfer the speaker's role based on this text."
+# The Reference Text itself is appended to the system prompt
+_USER_PROMPT = "Infer the speaker's role based on the Reference Text."
 
 # --- Main Agent Function ---
 async def infer_role(
@@ -43,8 +39,8 @@ async def infer_role(
     """
     Dynamically infers a speaker role from the reference text.
     """
-    system_prompt = _get_system_prompt()
-    user_prompt = _get_user_prompt(reference_text)
+    system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT, reference_text)
+    user_prompt = _USER_PROMPT
 
     # Call the generic LLM agent and expect a RoleOutput object
     response_obj = await llm_agent.call_llm(
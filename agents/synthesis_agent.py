@@ -1,7 +1,8 @@
 # agents/synthesis_agent.py
+import json
 from pydantic import BaseModel, Field
-from typing import Optional, Tuple
-from .llm_agent import LLMAgent
+from typing import List, Optional, Tuple
+from .llm_agent import LLMAgent, system_prompt_with_reference
 
 # --- Pydantic Output Model ---
 class SynthesisOutput(BaseModel):
@@ -18,12 +19,41 @@ class SynthesisOutput(BaseModel):
         description="A high-quality instruction (prompt) to guide another LLM, aligned with the role, topic, and reference text."
     )
 
-# --- System Prompt ---
-def _get_system_prompt() -> str:
+class RoleTopicPromptOutput(BaseModel):
     """
-    Returns the Chain-of-Thought (CoT) system prompt for the Synthesis Agent .
+    Defines the JSON structure for the one-call synthesis of a whole genome:
+    the inferred role together with its topic and prompt.
     """
-    return f"""
+    role: str = Field(
+        ...,
+        description="The inferred speaker role based on the text (e.g., a concerned citizen, a health expert, an official spokesperson)."
+    )
+    topic: str = Field(
+        ...,
+        description="A concise topic that captures the core theme, based on the analysis."
+    )
+    prompt: str = Field(
+        ...,
+        description="A high-quality instruction (prompt) to guide another LLM, aligned with the role, topic, and reference text."
+    )
+
+class BatchRoleTopicPromptOutput(BaseModel):
+    """
+    Defines the JSON structure for synthesizing several distinct genomes
+    in one call.
+    """
+    results: List[RoleTopicPromptOutput] = Field(
+        ...,
+        description="The requested number of distinct (role, topic, prompt) objects."
+    )
+
+# Token budget per genome for the batched synthesis output
+_BATCH_TOKENS_PER_INDIVIDUAL = 160
+
+# --- System Prompts ---
+_SCHEMA_JSON = json.dumps(SynthesisOutput.model_json_schema(), separators=(",", ":"))
+
+_SYSTEM_PROMPT = f"""
     You are an expert prompt engineer. Your task is to generate a Topic and a Prompt based on a given context.
     You must follow this internal reasoning process:
 
@@ -32,21 +62,61 @@ def _get_system_prompt() -> str:
     3.  Construct Prompt: Using the Topic you just defined and your analysis, construct a high-quality instruction (prompt) that guides another LLM to generate a short, 1-2 sentence text. This prompt must be aligned with the Role, Topic, and Reference Text.
 
     Your response MUST be a single JSON object conforming to the following schema:
-    {SynthesisOutput.model_json_schema()}
+    {_SCHEMA_JSON}
         """.strip()
 
-# --- User Prompt ---
-def _get_user_prompt(role: str, reference_text: str) -> str:
-    """
-    Returns the user prompt containing the role and reference text [cite: 830-832].
-    """
-    return f"""
-    Reference Text: "{reference_text}"
+_FULL_SCHEMA_JSON = json.dumps(RoleTopicPromptOutput.model_json_schema(), separators=(",", ":"))
+
+# Role inference + topic/prompt synthesis as steps of a single call
+_FULL_SYSTEM_PROMPT = f"""
+    You are an expert text analyst and prompt engineer. Your task is to generate a Role, a Topic and a Prompt based on a given context.
+    You must follow this internal reasoning process:
+
+    1.  Infer Role: Read the provided Reference Text and infer the most likely role of its speaker, focusing on the context, tone, and content.
+    2.  Define Topic: Based on your analysis, define a concise Topic that captures the core theme.
+    3.  Construct Prompt: Using the Role and Topic you just defined, construct a high-quality instruction (prompt) that guides another LLM to generate a short, 1-2 sentence text. This prompt must be aligned with the Role, Topic, and Reference Text.
+
+    Your response MUST be a single JSON object conforming to the following schema:
+    {_FULL_SCHEMA_JSON}
+        """.strip()
+
+_BATCH_SCHEMA_JSON = json.dumps(BatchRoleTopicPromptOutput.model_json_schema(), separators=(",", ":"))
+
+# Same task, producing several genomes per call so the instructions and the
+# Reference Text are only processed once for all of them.
+_BATCH_SYSTEM_PROMPT = f"""
+    You are an expert text analyst and prompt engineer. Your task is to generate
+    SEVERAL distinct (Role, Topic, Prompt) combinations based on a given context.
+    For each combination, you must follow this internal reasoning process:
+
+    1.  Infer Role: Read the provided Reference Text and infer a plausible role of its speaker, focusing on the context, tone, and content.
+    2.  Define Topic: Based on your analysis, define a concise Topic that captures the core theme.
+    3.  Construct Prompt: Using the Role and Topic you just defined, construct a high-quality instruction (prompt) that guides another LLM to generate a short, 1-2 sentence text. This prompt must be aligned with the Role, Topic, and Reference Text.
+
+    The combinations must be distinct from each other (different perspectives,
+    themes or phrasings), while all of them stay relevant to the Reference Text.
+
+    Your response MUST be a single JSON object conforming to the following schema:
+    {_BATCH_SCHEMA_JSON}
+        """.strip()
+
+# --- User Prompts ---
+_FULL_USER_PROMPT = "Generate the Role, Topic and Prompt based on the Reference Text."
+
+_BATCH_USER_TEMPLATE = "Generate {k} distinct Role, Topic and Prompt combinations based on the Reference Text."
+
+_USER_TEMPLATE = """
     Role: "{role}"
 
-    Generate the Topic and Prompt based on this context.
+    Generate the Topic and Prompt based on this context and the Reference Text.
         """.strip()
 
+def _get_user_prompt(role: str) -> str:
+    """
+    Returns the user prompt containing the role [cite: 830-832].
+    """
+    return _USER_TEMPLATE.format_map({"role": role})
+
 # --- Main Agent Function ---
 async def generate_topic_and_prompt(
     role: str,
@@ -57,8 +127,8 @@ async def generate_topic_and_prompt(
     """
     Dynamically generates a topic and a prompt from a role and reference text.
     """
-    system_prompt = _get_system_prompt()
-    user_prompt = _get_user_prompt(role, reference_text)
+    system_prompt = system_prompt_with_reference(_SYSTEM_PROMPT, reference_text)
+    user_prompt = _get_user_prompt(role)
 
     # Call the generic LLM agent and expect a SynthesisOutput object
     response_obj = await llm_agent.call_llm(
@@ -73,4 +143,63 @@ async def generate_topic_and_prompt(
         return response_obj.topic, response_obj.prompt
     
     # Return None if the LLM call or validation failed
-    return None
\ No newline at end of file
+    return None
+
+async def generate_role_topic_prompt(
+    reference_text: str,
+    llm_agent: LLMAgent,
+    temperature: float = 0.7
+) -> Optional[Tuple[str, str, str]]:
+    """
+    Infers a role and generates its topic and prompt in one LLM call
+    (instead of infer_role followed by generate_topic_and_prompt).
+    Returns a tuple (role, topic, prompt) or None on failure.
+    """
+    system_prompt = system_prompt_with_reference(_FULL_SYSTEM_PROMPT, reference_text)
+
+    response_obj = await llm_agent.call_llm(
+        system_prompt=system_prompt,
+        user_prompt=_FULL_USER_PROMPT,
+        output_model=RoleTopicPromptOutput,
+        temperature=temperature
+    )
+
+    if isinstance(response_obj, RoleTopicPromptOutput):
+        role = response_obj.role.strip()
+        topic = response_obj.topic.strip()
+        prompt = response_obj.prompt.strip()
+        if role and topic and prompt:
+            return role, topic, prompt
+
+    return None
+
+async def generate_k_role_topic_prompts(
+    k: int,
+    reference_text: str,
+    llm_agent: LLMAgent,
+    temperature: float = 0.7
+) -> List[Tuple[str, str, str]]:
+    """
+    Generates up to k distinct (role, topic, prompt) tuples with one LLM call.
+    Incomplete entries are dropped, so the result may hold fewer than k
+    tuples (empty on failure).
+    """
+    if k <= 0:
+        return []
+
+    response_obj = await llm_agent.call_llm(
+        system_prompt=system_prompt_with_reference(_BATCH_SYSTEM_PROMPT, reference_text),
+        user_prompt=_BATCH_USER_TEMPLATE.format_map({"k": k}),
+        output_model=BatchRoleTopicPromptOutput,
+        temperature=temperature,
+        max_tokens=_BATCH_TOKENS_PER_INDIVIDUAL * k
+    )
+
+    genomes: List[Tuple[str, str, str]] = []
+    if isinstance(response_obj, BatchRoleTopicPromptOutput):
+        for item in response_obj.results[:k]:
+            role, topic, prompt = item.role.strip(), item.topic.strip(), item.prompt.strip()
+            if role and topic and prompt:
+                genomes.append((role, topic, prompt))
+
+    return genomes
@@ -2,95 +2,292 @@
 import random
 import asyncio
 import time
-from typing import List, Optional
-from pathlib import Path
+import numpy as np
+from typing import Dict, List, Optional, Tuple
 from tqdm.asyncio import tqdm
 
-from ga.genome import Individual
+from ga.genome import Individual, fitness_array
 from agents.llm_agent import LLMAgent
-from metrics.fitness import evaluate_population_fitness
+from metrics.fitness import evaluate_population_fitness, ReferenceEmbedding
 from ga.reporting import get_fitness_stats, check_stagnation
-from utils.saving import append_metrics_to_csv
+from utils.saving import MetricsWriter
 
 # Import Semantic Operators
-from agents.crossover_agent import semantic_crossover
+from agents.crossover_agent import semantic_crossover, semantic_crossover_batch
 from agents.mutation_agent import semantic_mutation
-from agents.regenerate_prompt_agent import regenerate_prompt
+from agents.evolve_agent import evolve_genome
+from agents.fused_prompt_and_data_agent import fused_generate
 from agents.generate_data_agent import generate_data_for_individual
 
 # --- Constants ---
-CHILD_BATCH_SIZE = 10   # Max parallel LLM calls for new children
+CHILD_BATCH_SIZE = 10   # Parent pairs per batched crossover call
+STAGE_WORKERS = 8       # Concurrent LLM workers per child pipeline stage
+FITNESS_MICRO_BATCH = 8 # Max finished children scored per BERTScore call
 STAGNATION_LIMIT = 3    # Generations to wait before enabling "Creative Leap"
 
+# Per-run phenotype cache: (role, topic) -> (prompt, generated_data).
+# Children whose genome already exists (e.g. a parent copied without mutation)
+# reuse the known prompt and data instead of another LLM call.
+GenomeCache = Dict[Tuple[str, str], Tuple[str, str]]
+
 # --- Selection ---
-def tournament_selection(population: List[Individual], k: int = 3) -> Individual:
-    """Selects an individual using k-tournament selection."""
-    candidates = random.sample(population, k)
-    return max(candidates, key=lambda ind: ind["fitness"])
+def tournament_batch(fitnesses: np.ndarray, n_pairs: int, k: int = 3) -> np.ndarray:
+    """
+    Runs 2 * n_pairs k-tournaments at once and returns the winners'
+    population indices with shape (n_pairs, 2), one row per parent pair.
+    Candidates are drawn with replacement.
+    """
+    candidates = np.random.randint(0, len(fitnesses), size=(n_pairs * 2, k))
+    winners = candidates[np.arange(n_pairs * 2), fitnesses[candidates].argmax(axis=1)]
+    return winners.reshape(n_pairs, 2)
 
 # --- Child Pipeline ---
-async def _process_child_pipeline(
+# Each child goes through two LLM-bound stages:
+#   genome (crossover/copy + mutation) -> phenotype (prompt regeneration + data generation)
+# When crossover and mutation both fire, the genome stage also writes the
+# prompt (one fused call), and the phenotype stage only generates data.
+# Stages are connected by queues and served by independent workers, so a
+# child that finishes one stage immediately moves on without waiting for
+# the rest of its batch, and Ollama always has queued work. Finished
+# children are scored in micro-batches while the others are still in the
+# LLM stages.
+
+async def _evolve_genome(
     parent1: Individual,
     parent2: Individual,
+    do_crossover: bool,
+    do_mutation: bool,
+    crossed_genome: Optional[Tuple[str, str]],
     reference_text: str,
     llm_agent: LLMAgent,
-    prob_crossover: float,
-    prob_mutation: float,
     is_stuck: bool
-) -> Optional[Individual]:
+) -> Optional[Tuple[str, str, Optional[str]]]:
     """
-    The full asynchronous pipeline to create one new child.
+    Stage 1: produces the child's (role, topic, prompt).
     Implements the sequential probability model.
+
+    The crossover and mutation draws are made by the producer so that all
+    plain crossovers of a batch can share one LLM call ('crossed_genome'
+    carries that result). When both operators fire, crossover, mutation
+    and prompt regeneration are done by a single fused call; otherwise
+    the prompt is None and is regenerated by the next stage.
     """
-    try:
-        new_role, new_topic = None, None
-        
-        # 1. Crossover or Reproduction (Copy)
-        if random.random() < prob_crossover:
-            # Crossover
+    new_role, new_topic = None, None
+
+    # 0. Crossover + Mutation (+ Prompt) in one call
+    if do_crossover and do_mutation:
+        attribute_to_mutate = "role" if random.random() < 0.5 else "topic"
+        return await evolve_genome(
+            parent1, parent2, attribute_to_mutate, reference_text, llm_agent, is_stuck
+        )
+
+    # 1. Crossover or Reproduction (Copy)
+    if do_crossover:
+        # Crossover (fall back to a single call if the batch missed this pair)
+        result = crossed_genome
+        if result is None:
             result = await semantic_crossover(parent1, parent2, reference_text, llm_agent)
-            if result: new_role, new_topic = result
-        else:
-            # Reproduction (Copy parent 1)
-            new_role, new_topic = parent1['role'], parent1['topic']
-            
+        if result: new_role, new_topic = result
+    else:
+        # Reproduction (Copy parent 1)
+        new_role, new_topic = parent1['role'], parent1['topic']
+
+    if not (new_role and new_topic):
+        return None # Crossover failed or parent was invalid
+
+    # 2. Mutation (Independent)
+    if do_mutation:
+        # We mutate the genome after it has been crossed or copied
+        temp_individual = Individual(role=new_role, topic=new_topic, prompt="", generated_data=None, fitness=0.0)
+        result = await semantic_mutation(temp_individual, reference_text, llm_agent, is_stuck)
+        if result: new_role, new_topic = result
+
         if not (new_role and new_topic):
-            return None # Crossover failed or parent was invalid
-
-        # 2. Mutation (Independent)
-        if random.random() < prob_mutation:
-            # We mutate the genome after it has been crossed or copied
-            temp_individual = Individual(role=new_role, topic=new_topic, prompt="", generated_data=None, fitness=0.0)
-            result = await semantic_mutation(temp_individual, reference_text, llm_agent, is_stuck)
-            if result: new_role, new_topic = result
-            
-            if not (new_role and new_topic):
-                return None # Mutation failed
-        
-        # 3. Regenerate Prompt
-        new_prompt = await regenerate_prompt(new_role, new_topic, reference_text, llm_agent)
-        if not new_prompt:
-            return None # Prompt regeneration failed
+            return None # Mutation failed
+
+    return new_role, new_topic, None
+
+async def _breed_children(
+    population: List[Individual],
+    fitnesses: np.ndarray,
+    n_children: int,
+    reference_text: str,
+    llm_agent: LLMAgent,
+    k_tournament: int,
+    prob_crossover: float,
+    prob_mutation: float,
+    is_stuck: bool,
+    generation: int,
+    max_generations: int,
+    bert_model: str,
+    genome_cache: GenomeCache,
+    pbar: tqdm,
+    reference_embedding: Optional[ReferenceEmbedding] = None
+) -> List[Individual]:
+    """
+    Creates and evaluates exactly 'n_children' new children.
 
-        # 4. Build the individual (unevaluated)
-        child = Individual(
+    A producer selects parents and runs the batched crossover, then feeds
+    the stage queues. Failed children free their slot so the producer can
+    launch replacements; no more than 'n_children' are ever in flight.
+    An evaluator task scores completed children (in a worker thread)
+    as soon as they come out of the pipeline.
+    'genome_cache' belongs to the current run (see run_evolution).
+    """
+    # Every evaluated individual is a known phenotype for its genome; the
+    # current population's phenotype wins over one remembered earlier
+    for ind in population:
+        if ind['generated_data']:
+            genome_cache[(ind['role'], ind['topic'])] = (ind['prompt'], ind['generated_data'])
+
+    q_genome: asyncio.Queue = asyncio.Queue()
+    q_phenotype: asyncio.Queue = asyncio.Queue()
+    q_fitness: asyncio.Queue = asyncio.Queue()
+
+    children: List[Individual] = []
+    evaluated_children: List[Individual] = []
+    in_flight = 0
+    slot_freed = asyncio.Event()
+
+    def _release(child: Optional[Individual]):
+        nonlocal in_flight
+        in_flight -= 1
+        if child is not None:
+            children.append(child)
+            q_fitness.put_nowait(child)
+            pbar.update(1)
+        slot_freed.set()
+
+    async def _evaluator():
+        done = False
+        while not done:
+            batch = [await q_fitness.get()]
+            while len(batch) < FITNESS_MICRO_BATCH and not q_fitness.empty():
+                batch.append(q_fitness.get_nowait())
+
+            # A None marks the end of the generation
+            done = batch[-1] is None
+            batch = [child for child in batch if child is not None]
+            if batch:
+                evaluated_children.extend(await asyncio.to_thread(
+                    evaluate_population_fitness,
+                    population=batch,
+                    reference_text=reference_text,
+                    generation=generation,
+                    max_generations=max_generations,
+                    bert_model=bert_model,
+                    reference_embedding=reference_embedding
+                ))
+
+    async def _producer():
+        nonlocal in_flight
+        while len(children) < n_children:
+            n_needed = n_children - len(children) - in_flight
+            if n_needed <= 0:
+                # Everything needed is already in the pipeline
+                slot_freed.clear()
+                await slot_freed.wait()
+                continue
+
+            batch_size = min(n_needed, CHILD_BATCH_SIZE)
+            in_flight += batch_size
+
+            pairs = [
+                (population[i1], population[i2])
+                for i1, i2 in tournament_batch(fitnesses, batch_size, k=k_tournament)
+            ]
+            flags = [
+                (random.random() < prob_crossover, random.random() < prob_mutation)
+                for _ in pairs
+            ]
+
+            # All plain crossovers of the batch go to the LLM in one prompt
+            # (crossover + mutation is handled by the fused evolve call)
+            crossover_pairs = [
+                pair for pair, (do_crossover, do_mutation) in zip(pairs, flags)
+                if do_crossover and not do_mutation
+            ]
+            batch_results = iter(
+                await semantic_crossover_batch(crossover_pairs, reference_text, llm_agent)
+            )
+
+            for (p1, p2), (do_crossover, do_mutation) in zip(pairs, flags):
+                crossed_genome = None
+                if do_crossover and not do_mutation:
+                    crossed_genome = next(batch_results)
+                q_genome.put_nowait((p1, p2, do_crossover, do_mutation, crossed_genome))
+
+    async def _genome_step(item) -> Optional[Tuple[str, str, Optional[str]]]:
+        p1, p2, do_crossover, do_mutation, crossed_genome = item
+        return await _evolve_genome(
+            p1, p2, do_crossover, do_mutation, crossed_genome,
+            reference_text, llm_agent, is_stuck
+        )
+
+    async def _phenotype_step(genome: Tuple[str, str, Optional[str]]) -> Optional[Individual]:
+        new_role, new_topic, new_prompt = genome
+
+        cached = genome_cache.get((new_role, new_topic))
+        if cached is None:
+            if new_prompt:
+                # Prompt already written by the fused evolve call: only the data is missing
+                draft = Individual(role=new_role, topic=new_topic, prompt=new_prompt, generated_data=None, fitness=0.0)
+                new_data = await generate_data_for_individual(draft, reference_text, llm_agent)
+                cached = (new_prompt, new_data) if new_data else None
+            else:
+                # Regenerate the prompt and generate its data in one call
+                cached = await fused_generate(new_role, new_topic, reference_text, llm_agent)
+            if not cached:
+                return None # Prompt/data generation failed
+            genome_cache.setdefault((new_role, new_topic), cached)
+
+        new_prompt, new_data = cached
+        return Individual(
             role=new_role,
             topic=new_topic,
             prompt=new_prompt,
-            generated_data=None,
+            generated_data=new_data,
             fitness=0.0
-        )
+        ) # The complete, unevaluated child
 
-        # 5. Generate Data
-        new_data = await generate_data_for_individual(child, reference_text, llm_agent)
-        if not new_data:
-            return None # Data generation failed
+    async def _worker(q_in: asyncio.Queue, step, q_out: Optional[asyncio.Queue]):
+        while True:
+            item = await q_in.get()
+            try:
+                result = await step(item)
+            except Exception:
+                result = None # Fail-safe
 
-        child['generated_data'] = new_data
-        return child # Return the complete, unevaluated child
-        
-    except Exception:
-        return None # Fail-safe
+            if result is None:
+                _release(None)
+            elif q_out is None:
+                _release(result)
+            else:
+                q_out.put_nowait(result)
+
+    stages = [
+        (q_genome, _genome_step, q_phenotype),
+        (q_phenotype, _phenotype_step, None),
+    ]
+    workers = [
+        asyncio.create_task(_worker(q_in, step, q_out))
+        for q_in, step, q_out in stages
+        for _ in range(STAGE_WORKERS)
+    ]
+
+    evaluator = asyncio.create_task(_evaluator())
+
+    try:
+        # The producer returns once the last needed child has been released
+        await _producer()
+        q_fitness.put_nowait(None)
+        await evaluator
+    finally:
+        for task in workers + [evaluator]:
+            task.cancel()
+        await asyncio.gather(*workers, evaluator, return_exceptions=True)
+
+    return evaluated_children
 
 # --- Main Evolution Loop ---
 async def run_evolution(
@@ -103,23 +300,33 @@ async def run_evolution(
     prob_crossover: float,
     prob_mutation: float,
     elite_size: int,
-    output_dir: Path
+    metrics_writer: MetricsWriter,
+    reference_embedding: Optional[ReferenceEmbedding] = None
 ) -> List[Individual]:
     """
     The main asynchronous GA loop.
+    'reference_embedding' (see metrics.fitness.encode_reference) is reused
+    by every fitness evaluation.
     """
     print("\n--- 🚀 Starting Evolution ---")
     current_population = population
+    # Fitness kept as a dense column next to the population list;
+    # sorting and selection only ever touch this array
+    fitness = fitness_array(current_population)
     pop_size = len(current_population)
     fitness_history = [get_fitness_stats(current_population)["mean"]]
     is_stuck = False
+    # Scoped to this run, so runs sharing a process (e.g. irace trials) stay independent
+    genome_cache: GenomeCache = {}
 
     for g in range(1, generations + 1):
         gen_start_time = time.time()
         print(f"\n--- Generation {g}/{generations} ---")
         
         # Sort population by fitness (descending)
-        current_population.sort(key=lambda ind: ind["fitness"], reverse=True)
+        order = np.argsort(-fitness, kind="stable")
+        current_population = [current_population[i] for i in order]
+        fitness = fitness[order]
         
         # 1. Check for Stagnation
         is_stuck = check_stagnation(fitness_history, STAGNATION_LIMIT)
@@ -131,59 +338,28 @@ async def run_evolution(
         new_population = current_population[:elite_size]
         # print(f"   Elite size: {len(new_population)} individuals preserved.")
         
-        # 3. Create Children (in parallel batches)
+        # 3. Create and evaluate children (through the staged LLM pipeline)
         children_to_create = pop_size - elite_size
-        new_children: List[Individual] = []
 
         with tqdm(total=children_to_create, desc=f"Gen {g}/{generations} Children", unit="child") as pbar:
-            while len(new_children) < children_to_create:
-                n_needed = children_to_create - len(new_children)
-                batch_size = min(n_needed, CHILD_BATCH_SIZE)
-                # print(f"   ... Launching child batch of {batch_size} (Target: {len(new_children)}/{children_to_create})")
-
-                tasks = []
-                for _ in range(batch_size):
-                    p1 = tournament_selection(current_population, k=k_tournament)
-                    p2 = tournament_selection(current_population, k=k_tournament)
-                    tasks.append(
-                        _process_child_pipeline(
-                            p1, p2, reference_text, llm_agent,
-                            prob_crossover, prob_mutation, is_stuck
-                        )
-                    )
-                
-                # Run tasks in parallel
-                results = await asyncio.gather(*tasks)
-                
-                successful_children = [child for child in results if child is not None]
-                new_children.extend(successful_children)
-
-                # Update progress bar
-                pbar.update(len(successful_children))
-                # print(f"   ... Batch complete. {len(successful_children)} successful children.")
-
-        # 4. Evaluate all new children in one batch
-        # print(f"   ... Evaluating fitness for {len(new_children)} new children...")
-        evaluated_children = evaluate_population_fitness(
-            population=new_children,
-            reference_text=reference_text,
-            generation=g,
-            max_generations=generations,
-            bert_model=bert_model
-        )
-        
-        # 5. Form the final new population
+            evaluated_children = await _breed_children(
+                current_population, fitness, children_to_create, reference_text, llm_agent,
+                k_tournament, prob_crossover, prob_mutation, is_stuck,
+                g, generations, bert_model, genome_cache, pbar, reference_embedding
+            )
+
+        # 4. Form the final new population
         new_population.extend(evaluated_children)
         current_population = new_population
+        fitness = np.concatenate([fitness[:elite_size], fitness_array(evaluated_children)])
 
-        # 6. Report stats for the new generation
+        # 5. Report stats for the new generation
         stats = get_fitness_stats(current_population)
         fitness_history.append(stats["mean"])
         gen_time = time.time() - gen_start_time
 
         # Save metrics to CSV
-        append_metrics_to_csv(
-            output_dir=output_dir,
+        metrics_writer.append(
             generation=g,
             stats=stats,
             duration_sec=gen_time
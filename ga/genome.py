@@ -1,5 +1,6 @@
 # ga/genome.py
-from typing import TypedDict, Optional
+from typing import List, TypedDict, Optional
+import numpy as np
 
 """
 Defines the genome for an individual in the population.
@@ -15,4 +16,13 @@ class Individual(TypedDict):
     generated_data: Optional[str]
 
     # Evaluation metric
-    fitness: float
\ No newline at end of file
+    fitness: float
+
+def fitness_array(population: List[Individual]) -> np.ndarray:
+    """
+    Returns the population's fitness values as a dense float array
+    (the columnar view used by sorting and selection).
+    """
+    return np.fromiter(
+        (ind["fitness"] for ind in population), dtype=np.float64, count=len(population)
+    )
@@ -1,16 +1,21 @@
 # ga/initial_population.py
 import asyncio
-from typing import List, Optional
+from typing import Dict, List, Optional
 from tqdm.asyncio import tqdm
 
 from ga.genome import Individual
 from agents.llm_agent import LLMAgent
 from agents.role_agent import infer_role
-from agents.synthesis_agent import generate_topic_and_prompt
+from agents.synthesis_agent import (
+    generate_topic_and_prompt, generate_role_topic_prompt, generate_k_role_topic_prompts
+)
 
-# Default batch size to avoid overwhelming the LLM service
+# Maximum concurrent creation calls, to avoid overwhelming the LLM service
 DEFAULT_BATCH_SIZE = 10
 
+# Individuals requested per LLM call (one prompt emits K genomes)
+MARSHAL_SIZE = 5
+
 async def _create_one_individual(
     reference_text: str,
     llm_agent: LLMAgent,
@@ -18,10 +23,28 @@ async def _create_one_individual(
     synthesis_temp: float = 0.7
 ) -> Optional[Individual]:
     """
-    Private helper function to manage the sequential creation of a single individual.
+    Private helper function to manage the creation of a single individual.
+    Role, topic and prompt come from one LLM call; the sequential two-step
+    path is only used when that call fails.
     """
     try:
-        # 1. Infer Role
+        # 0. Role + Topic + Prompt in one call
+        genome = await generate_role_topic_prompt(
+            reference_text=reference_text,
+            llm_agent=llm_agent,
+            temperature=synthesis_temp
+        )
+        if genome:
+            role, topic, prompt = genome
+            return Individual(
+                role=role,
+                topic=topic,
+                prompt=prompt,
+                generated_data=None,
+                fitness=0.0
+            )
+
+        # Fallback: 1. Infer Role
         role = await infer_role(
             reference_text=reference_text,
             llm_agent=llm_agent,
@@ -57,6 +80,49 @@ async def _create_one_individual(
         print(f"Error during individual creation: {e}")
         return None
 
+async def _create_k_individuals(
+    k: int,
+    reference_text: str,
+    llm_agent: LLMAgent,
+    synthesis_temp: float = 0.7
+) -> List[Individual]:
+    """
+    Private helper function that creates up to k individuals with one LLM call.
+    """
+    genomes = await generate_k_role_topic_prompts(
+        k=k,
+        reference_text=reference_text,
+        llm_agent=llm_agent,
+        temperature=synthesis_temp
+    )
+    return [
+        Individual(role=role, topic=topic, prompt=prompt, generated_data=None, fitness=0.0)
+        for role, topic, prompt in genomes
+    ]
+
+async def _create_bounded(
+    sem: asyncio.Semaphore,
+    k: int,
+    reference_text: str,
+    llm_agent: LLMAgent
+) -> List[Individual]:
+    """
+    Private helper function that runs one creation call inside the pool:
+    a marshaled call for k > 1, the one-individual path for k == 1.
+    """
+    async with sem:
+        if k > 1:
+            return await _create_k_individuals(
+                k=k,
+                reference_text=reference_text,
+                llm_agent=llm_agent
+            )
+        individual = await _create_one_individual(
+            reference_text=reference_text,
+            llm_agent=llm_agent
+        )
+        return [individual] if individual else []
+
 async def create_initial_population(
     n: int,
     llm_agent: LLMAgent,
@@ -64,46 +130,49 @@ async def create_initial_population(
 ) -> List[Individual]:
     """
     Creates the initial population of n individuals.
-    Uses a loop to ensure the successful creation of each individual.
-    Processes individuals in parallel batches for improved efficiency.
+    Creation calls run in a pool of at most DEFAULT_BATCH_SIZE concurrent
+    calls, and a replacement is launched as soon as a call comes back short,
+    so no call waits for the slowest one of a batch.
+    Each call asks for up to MARSHAL_SIZE individuals; the individuals
+    missing after a call that yielded nothing are retried one per call.
     """
     print(f"🧬 Starting initial population generation for {n} individuals...")
     population: List[Individual] = []
+    sem = asyncio.Semaphore(DEFAULT_BATCH_SIZE)
+    in_flight: Dict[asyncio.Task, int] = {} # Task -> individuals requested
 
-    with tqdm(total=n, desc="Creating Gen 0", unit="ind") as pbar:
-        while len(population) < n:
-            # Determine how many individuals are needed
-            n_needed = n - len(population) 
-
-            # Define next batch size
-            batch_size = min(n_needed, DEFAULT_BATCH_SIZE)
+    def _launch(n_missing: int, marshaled: bool) -> None:
+        while n_missing > 0:
+            k = min(MARSHAL_SIZE, n_missing) if marshaled else 1
+            task = asyncio.create_task(_create_bounded(sem, k, reference_text, llm_agent))
+            in_flight[task] = k
+            n_missing -= k
 
-            # print(f"🔄 Generating batch of {batch_size} individuals... (Current: {len(population)}/{n})")
+    with tqdm(total=n, desc="Creating Gen 0", unit="ind") as pbar:
+        _launch(n, marshaled=True)
 
-            # Create tasks for the batch
-            tasks = [
-                _create_one_individual(
-                    reference_text=reference_text,
-                    llm_agent=llm_agent
-                ) for _ in range(batch_size)
-            ]
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
 
-            # Run tasks concurrently
-            results = await asyncio.gather(*tasks)
-        
-            # Filter out any 'None' results from failed generations
-            new_individuals = [ind for ind in results if ind is not None]
+            n_retry_single = 0
+            for task in done:
+                k = in_flight.pop(task)
+                new_individuals = task.result()[:n - len(population)]
+                if not new_individuals:
+                    n_retry_single += k
 
-            # Add successfully created individuals to the population
-            population.extend(new_individuals)
+                # Add successfully created individuals to the population
+                population.extend(new_individuals)
 
-            # Update progress bar
-            pbar.update(len(new_individuals))
+                # Update progress bar
+                pbar.update(len(new_individuals))
 
-            '''if new_individuals:
-                print(f"✅ Batch complete. Added {len(new_individuals)} individuals.")
-            else:
-                print(f"⚠️ Batch complete. No individuals were added in this batch. Retrying...")'''
+            # Replace what the finished calls did not deliver
+            n_missing = n - len(population) - sum(in_flight.values())
+            if n_missing > 0:
+                n_single = min(n_missing, n_retry_single)
+                _launch(n_single, marshaled=False)
+                _launch(n_missing - n_single, marshaled=True)
     
     print(f"✅ Initial population created. Generated {len(population)} individuals.")
-    return population
\ No newline at end of file
+    return population
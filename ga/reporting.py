@@ -1,5 +1,5 @@
 # ga/reporting.py
-import statistics
+import numpy as np
 from typing import List, Dict, Any
 from ga.genome import Individual
 
@@ -7,16 +7,19 @@ def get_fitness_stats(population: List[Individual]) -> Dict[str, Any]:
     """
     Calculates fitness statistics for a given population.
     """
-    fitness_scores = [ind.get("fitness", 0.0) for ind in population]
-    if not fitness_scores:
+    if not population:
         return {"count": 0, "mean": 0.0, "std": 0.0, "min": 0.0, "max": 0.0}
 
+    fitness_scores = np.fromiter(
+        (ind.get("fitness", 0.0) for ind in population), dtype=np.float64, count=len(population)
+    )
+
     return {
-        "count": len(fitness_scores),
-        "mean": statistics.mean(fitness_scores),
-        "std": statistics.pstdev(fitness_scores) if len(fitness_scores) > 1 else 0.0,
-        "min": min(fitness_scores),
-        "max": max(fitness_scores),
+        "count": int(fitness_scores.size),
+        "mean": float(fitness_scores.mean()),
+        "std": float(fitness_scores.std()), # Population std (as statistics.pstdev)
+        "min": float(fitness_scores.min()),
+        "max": float(fitness_scores.max()),
     }
 
 def check_stagnation(
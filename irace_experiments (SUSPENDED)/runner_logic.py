@@ -9,12 +9,20 @@ import csv
 import re
 import argparse
 import math
+import os
+import asyncio
+import contextlib
+import shlex
 
 # --- Configuration ---
 # Path to the main Python script, relative to this runner
 MAIN_SCRIPT_PATH = "../main.py" 
 # Path to the output directory that main.py creates
 EXEC_DIR_PATH = "../exec" 
+# Bytes read from the end of metrics_log.csv to find its last row
+TAIL_BLOCK_SIZE = 4096
+# Repository root (where main.py lives), for running it in-process
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
 # ---------------------
 
 def get_latest_exec_dir(base_dir=EXEC_DIR_PATH):
@@ -43,13 +51,25 @@ def get_final_max_fitness(exec_dir):
         return None
 
     try:
-        with open(metrics_file, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            header = next(reader)
-            
-            last_line = None
-            for line in reader:
-                last_line = line
+        with open(metrics_file, 'rb') as f:
+            # The header is the first line
+            header = next(csv.reader([f.readline().decode('utf-8')]))
+
+            # The last row is read from the end of the file, without
+            # scanning every generation (the block grows if a row is longer)
+            size = f.seek(0, os.SEEK_END)
+            block = TAIL_BLOCK_SIZE
+            while True:
+                start = max(0, size - block)
+                f.seek(start)
+                lines = f.read().decode('utf-8').splitlines()
+                if start == 0 or len(lines) > 1:
+                    break
+                block *= 2
+
+            # Rows only (at offset 0 the first line is the header)
+            rows = lines[1:] if start == 0 else lines[-1:]
+            last_line = next(csv.reader(rows[-1:]), None)
             
             if last_line:
                 # Find the 'max_fitness' column index
@@ -61,17 +81,10 @@ def get_final_max_fitness(exec_dir):
         return None
     return None
 
-def main():
-    # 1. Arguments passed from irace:
-    # sys.argv[1] = config_id
-    # sys.argv[2] = instance_id
-    # sys.argv[3] = seed
-    # sys.argv[4] = instance_path (e.g., 'reference_texts/text_01.txt')
-    # sys.argv[5:] = the parameters (e.g., '--n 100', '--prob_mutation 0.01', ...)
-    
-    instance_path = sys.argv[4]
-    irace_params = sys.argv[5:]
-
+def build_main_args(instance_path, irace_params):
+    """
+    Translates the irace parameters of one trial into main.py arguments.
+    """
     # 2. Use argparse to parse the parameters from irace
     parser = argparse.ArgumentParser()
     parser.add_argument("--n", type=int, required=True)
@@ -93,11 +106,8 @@ def main():
     # elite_size
     elit_int = max(1, math.ceil(args.elit_perc * args.n)) # At least 1 elite
     
-    # 4. Build the final command to call your main.py
-    python_exe = "/home/colossus/LLM/grumbly/Modelo-Evolutivo-Semantico-Adaptativo-para-Prompts/venv/bin/python"
-    command = [
-        python_exe,
-        MAIN_SCRIPT_PATH,
+    # 4. Build the arguments for main.py
+    return [
         "--n", str(args.n),
         "--generations", str(args.generations),
         "--prob_mutation", str(args.prob_mutation),
@@ -107,10 +117,30 @@ def main():
         "--reference_text", instance_path,
         "--outdir_base", EXEC_DIR_PATH # Tell main.py where to save results
     ]
+
+def main():
+    # 1. Arguments passed from irace:
+    # sys.argv[1] = config_id
+    # sys.argv[2] = instance_id
+    # sys.argv[3] = seed
+    # sys.argv[4] = instance_path (e.g., 'reference_texts/text_01.txt')
+    # sys.argv[5:] = the parameters (e.g., '--n 100', '--prob_mutation 0.01', ...)
+    
+    instance_path = sys.argv[4]
+    irace_params = sys.argv[5:]
+
+    # Build the final command to call your main.py
+    python_exe = "/home/colossus/LLM/grumbly/Modelo-Evolutivo-Semantico-Adaptativo-para-Prompts/venv/bin/python"
+    command = [python_exe, MAIN_SCRIPT_PATH] + build_main_args(instance_path, irace_params)
     
     # 5. Execute main.py
     try:
-        subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
+        # main.py's progress output is discarded; only stderr is kept for errors
+        subprocess.run(
+            command, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            text=True, encoding='utf-8'
+        )
     except subprocess.CalledProcessError as e:
         print("Error: main.py failed. See stderr below:", file=sys.stderr)
         print(e.stderr, file=sys.stderr)
@@ -136,5 +166,51 @@ def main():
     # This is the only line irace reads as the result
     print(f"{cost:.6f}")
 
+async def serve():
+    """
+    Long-lived worker: runs many trials in this process, so the Python,
+    torch and BERT start-up (and the LLM connections) are paid only once.
+
+    Reads one trial per stdin line, with the same fields irace passes to
+    the target runner (config_id instance_id seed instance_path params...),
+    and prints one line per trial: its cost, or 'Error' if it failed.
+    """
+    sys.path.insert(0, str(REPO_DIR))
+    import main as ga_main
+    from utils.setup import setup_logging
+    from agents.llm_agent import close_shared_agents
+
+    log_listener = setup_logging()
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                break # EOF: no more trials
+            fields = shlex.split(line)
+            if not fields:
+                continue
+
+            final_fitness = None
+            try:
+                main_args = build_main_args(fields[3], fields[4:])
+                # main.py's progress output must not mix with the costs
+                with contextlib.redirect_stdout(sys.stderr):
+                    exec_dir = await ga_main.main(main_args)
+                final_fitness = get_final_max_fitness(exec_dir)
+            except (Exception, SystemExit) as e: # argparse exits on bad parameters
+                print(f"Error: trial failed: {e!r}", file=sys.stderr)
+
+            if final_fitness is None:
+                print("Error", flush=True)
+            else:
+                print(f"{1.0 - final_fitness:.6f}", flush=True)
+    finally:
+        await close_shared_agents()
+        log_listener.stop()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if sys.argv[1:] == ["--serve"]:
+        asyncio.run(serve())
+    else:
+        main()
\ No newline at end of file
@@ -3,23 +3,30 @@ import argparse
 import asyncio
 import time
 from pathlib import Path
+from typing import List, Optional
 
 # Utilities
-from utils.setup import setup_experiment
+from utils.setup import setup_experiment, setup_logging
 from utils.saving import save_population_to_json
 from utils.saving import save_parameters_to_json
 from ga.reporting import get_fitness_stats
 
 
 # Pipeline Modules
-from agents.llm_agent import LLMAgent
+from agents.llm_agent import get_shared_agent, close_shared_agents
 from ga.initial_population import create_initial_population
-from metrics.fitness import evaluate_population_fitness
+from metrics.fitness import evaluate_population_fitness, encode_reference
 from ga.evolution import run_evolution, CHILD_BATCH_SIZE
 from agents.generate_data_agent import generate_data_for_individual
-from utils.saving import append_metrics_to_csv
+from utils.saving import MetricsWriter
 
-async def main():
+async def main(argv: Optional[List[str]] = None) -> Path:
+    """
+    Runs one experiment with the given command-line arguments (sys.argv by
+    default) and returns its output directory.
+    Can be awaited repeatedly in one process (e.g. by the irace runner),
+    reusing the loaded BERT model and the shared LLM connections.
+    """
     parser = argparse.ArgumentParser(description="Evolutionary Prompt Generation")
 
     # --- GA Parameters ---
@@ -34,13 +41,15 @@ async def main():
 
     # --- Model Parameters ---
     parser.add_argument("--model", default="llama3", help="Ollama LLM model to use.")
+    parser.add_argument("--ollama_hosts", nargs="+", default=None, help="Ollama server URLs to spread LLM calls across (default: local server).")
     parser.add_argument("--bert_model", default="bert-base-uncased", help="BERT model for fitness evaluation.")
 
     # --- IO Parameters ---
     parser.add_argument("--outdir_base", type=Path, default=Path("exec"), help="Base directory for experiment output.")
     parser.add_argument("--reference_text", type=str, default=None, help="Specific reference text file to use (optional).")
+    parser.add_argument("--llm_cache", type=Path, default=None, help="SQLite file that persists LLM responses so re-runs replay them (optional, e.g. exec/.llm_cache).")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # --- 1. Setup Experiment ---
     print("--- 1/6: Setting up experiment directory ---")
@@ -55,58 +64,60 @@ async def main():
     print(f"   → Output will be saved to: {output_dir}")
     print(f"   → Reference text loaded.")
 
-    total_start_time = time.time()
-    
-    # Initialize LLM Agent
-    llm_agent = LLMAgent(model=args.model)
-
-    # --- 2. Initial Population (Generation 0) ---
-    print(f"\n--- 2/6: Creating Initial Population (n={args.n}) ---")
-    # This step creates N individuals, but 'generated_data' is None
-    population_gen0 = await create_initial_population(
-        n=args.n,
-        llm_agent=llm_agent,
-        reference_text=reference_text
+    # Encode the reference text once (this also loads the BERT model);
+    # every fitness evaluation reuses it. It runs in a worker thread while
+    # Gen 0 is generated, hiding the model load behind the LLM calls.
+    reference_task = asyncio.create_task(
+        asyncio.to_thread(encode_reference, reference_text, args.bert_model)
     )
+
+    # The warm-up task must always be consumed: if Gen 0 fails, cancel it
+    # so its result (or exception) is not left behind (e.g. in irace serve mode)
+    try:
+        total_start_time = time.time()
     
-    # --- 3. Generate Data ---
-    print("\n--- 3/6: Generating data for Gen 0 ---")
-    gen0_start_time = time.time()
+        # Get the (process-wide) LLM Agent
+        llm_agent = get_shared_agent(
+            model=args.model,
+            hosts=tuple(args.ollama_hosts) if args.ollama_hosts else None,
+            cache_path=args.llm_cache
+        )
 
-    # We must ensure all N individuals have data before evaluating.
-    # We find all individuals that need data generated.
-    individuals_to_generate = [ind for ind in population_gen0 if ind['generated_data'] is None]
+        # --- 2. Initial Population (Generation 0) ---
+        print(f"\n--- 2/6: Creating Initial Population (n={args.n}) ---")
+        # This step creates N individuals, but 'generated_data' is None
+        population_gen0 = await create_initial_population(
+            n=args.n,
+            llm_agent=llm_agent,
+            reference_text=reference_text
+        )
     
-    # We process them in batches until all have data
-    while individuals_to_generate:
-        n_needed = len(individuals_to_generate)
-        batch_size = min(n_needed, CHILD_BATCH_SIZE)
-       # print(f"   ... Generating data for batch of {batch_size} (Remaining: {n_needed})")
-
-        # Create tasks for the current batch
-        tasks = [
-            generate_data_for_individual(ind, reference_text, llm_agent)
-            for ind in individuals_to_generate[:batch_size]
-        ]
-        
-        results = await asyncio.gather(*tasks)
-        
-        # We process the results of this batch
-        successful_indices = []
-        for i, data in enumerate(results):
-            if data:
-                # If successful, assign the data back to the individual
-                individuals_to_generate[i]['generated_data'] = data
-                successful_indices.append(i)
-        
-        # Update the list of individuals that still need data
-        # We rebuild the list by removing those that were successful
-        individuals_to_generate = [
-            ind for i, ind in enumerate(individuals_to_generate)
-            if i not in successful_indices
-        ]
-
-    print("All individuals for Gen 0 have generated data!")
+        # --- 3. Generate Data ---
+        print("\n--- 3/6: Generating data for Gen 0 ---")
+        gen0_start_time = time.time()
+
+        # We must ensure all N individuals have data before evaluating.
+        # Each individual retries until it gets data; at most CHILD_BATCH_SIZE
+        # calls run at once, and a free slot is taken as soon as one finishes.
+        sem = asyncio.Semaphore(CHILD_BATCH_SIZE)
+
+        async def _fill_data(ind) -> None:
+            while ind['generated_data'] is None:
+                async with sem:
+                    data = await generate_data_for_individual(ind, reference_text, llm_agent)
+                if data:
+                    # If successful, assign the data back to the individual
+                    ind['generated_data'] = data
+
+        await asyncio.gather(*[
+            _fill_data(ind) for ind in population_gen0 if ind['generated_data'] is None
+        ])
+
+        print("All individuals for Gen 0 have generated data!")
+        reference_embedding = await reference_task
+    except BaseException:
+        reference_task.cancel()
+        raise
     # --- 4. Evaluate Generated Data ---
     print("\n--- 4/6: Evaluating generated data for Gen 0 ---")
     
@@ -116,34 +127,37 @@ async def main():
         reference_text=reference_text,
         generation=0,
         max_generations=args.generations,
-        bert_model=args.bert_model
+        bert_model=args.bert_model,
+        reference_embedding=reference_embedding
     )
     
     # Now we get the total time for Gen 0 (Data Gen + Eval)
     gen0_total_time = time.time() - gen0_start_time
     
-    # Save Gen 0 metrics
-    gen0_stats = get_fitness_stats(evaluated_pop_gen0)
-    append_metrics_to_csv(output_dir, 0, gen0_stats, gen0_total_time)
-    save_population_to_json(evaluated_pop_gen0, output_dir / "population_gen_0.json")
+    # Save Gen 0 metrics (the metrics log stays open until evolution ends)
+    with MetricsWriter(output_dir) as metrics_writer:
+        gen0_stats = get_fitness_stats(evaluated_pop_gen0)
+        metrics_writer.append(0, gen0_stats, gen0_total_time)
+        save_population_to_json(evaluated_pop_gen0, output_dir / "population_gen_0.json")
     
-    print(f"   → Gen 0 evaluated. Avg Fitness: {gen0_stats['mean']:.4f}")
+        print(f"   → Gen 0 evaluated. Avg Fitness: {gen0_stats['mean']:.4f}")
     
-    # --- 5. Run Evolution ---
-    print(f"\n--- 5/6: Starting evolution for {args.generations} generations ---")
+        # --- 5. Run Evolution ---
+        print(f"\n--- 5/6: Starting evolution for {args.generations} generations ---")
     
-    final_population = await run_evolution(
-        population=evaluated_pop_gen0,
-        reference_text=reference_text,
-        llm_agent=llm_agent,
-        bert_model=args.bert_model,
-        generations=args.generations,
-        k_tournament=args.k,
-        prob_crossover=args.prob_crossover,
-        prob_mutation=args.prob_mutation,
-        elite_size=args.elite_size,
-        output_dir=output_dir
-    )
+        final_population = await run_evolution(
+            population=evaluated_pop_gen0,
+            reference_text=reference_text,
+            llm_agent=llm_agent,
+            bert_model=args.bert_model,
+            generations=args.generations,
+            k_tournament=args.k,
+            prob_crossover=args.prob_crossover,
+            prob_mutation=args.prob_mutation,
+            elite_size=args.elite_size,
+            metrics_writer=metrics_writer,
+            reference_embedding=reference_embedding
+        )
     
     # --- 6. Final Consolidated Evaluation ---
     print("\n--- 6/6: Running Final Consolidated Evaluation ---")
@@ -154,7 +168,8 @@ async def main():
         reference_text=reference_text,
         generation=args.generations,
         max_generations=args.generations,
-        bert_model=args.bert_model
+        bert_model=args.bert_model,
+        reference_embedding=reference_embedding
     )
     
     # Save the final, re-scored population
@@ -165,5 +180,19 @@ async def main():
     print(f"   Total time: {total_time:.2f}s")
     print(f"   Final results saved in: {output_dir}")
 
+    return output_dir
+
+async def _run() -> None:
+    """
+    Runs one experiment and closes the shared LLM connections on the way out.
+    """
+    # Non-blocking log sink (LLM errors are logged from the event loop)
+    log_listener = setup_logging()
+    try:
+        await main()
+    finally:
+        await close_shared_agents()
+        log_listener.stop()
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(_run())
\ No newline at end of file
@@ -16,11 +16,12 @@ def calculate_compression_ratio(text: str) -> float:
         return 1.0  # An empty text has no redundancy
 
     try:
-        original_size = len(text.encode('utf-8'))
+        data = text.encode('utf-8') # Encode once for both sizes
+        original_size = len(data)
         if original_size == 0:
             return 1.0
             
-        compressed_size = len(zlib.compress(text.encode('utf-8')))
+        compressed_size = len(zlib.compress(data))
         if compressed_size == 0:
             return 1.0 # Avoid division by zero
             
@@ -47,22 +48,21 @@ def calculate_internal_repetition(
     A value of 0.0 is perfect (0% repetition, high diversity).
     A value of 1.0 would be the theoretical worst (all repetitions).
     """
-    all_ngrams = []
     words = text.lower().split()
+    total_ngrams = 0
+    unique_ngrams = set()
     
     # Generate all n-grams in the [n_min, n_max] range
+    # (as word tuples: n-grams of different n never collide)
     for n in range(n_min, n_max + 1):
         if len(words) < n:
             continue # Skip if text is shorter than n
-        for i in range(len(words) - n + 1):
-            all_ngrams.append(" ".join(words[i:i+n]))
+        unique_ngrams.update(zip(*(words[i:] for i in range(n))))
+        total_ngrams += len(words) - n + 1
             
-    if not all_ngrams:
+    if not total_ngrams:
         return 0.0  # 0% repetition if no n-grams were found
-        
-    total_ngrams = len(all_ngrams)
-    unique_ngrams = len(set(all_ngrams))
     
     # This is the rate of n-grams that are repetitions.
-    repetition_rate = (total_ngrams - unique_ngrams) / float(total_ngrams)
-    return repetition_rate
\ No newline at end of file
+    repetition_rate = (total_ngrams - len(unique_ngrams)) / float(total_ngrams)
+    return repetition_rate
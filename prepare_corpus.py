@@ -42,11 +42,9 @@ def filter_simple_corpus():
                 if not row:  # Skip empty rows
                     continue
                 
-                # Take the text from the single column
-                tweet_text = row[0].strip()
-                
-                # 1. Count words (split by spaces)
-                words = tweet_text.split()
+                # 1. Count words (split by whitespace), stopping as soon as
+                # MIN_WORDS are found: the rest of a long tweet is not split
+                words = row[0].split(None, MIN_WORDS - 1)
                 
                 # 2. Apply filter
                 if len(words) >= MIN_WORDS:
@@ -0,0 +1,68 @@
+# tests/test_llm_agent.py
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+from pydantic import BaseModel
+from agents import llm_agent
+from agents.llm_agent import CachingLLMAgent, LLMAgent
+
+class _Output(BaseModel):
+    text: str
+
+def _closed_port() -> int:
+    """
+    Returns a local port with nothing listening on it.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class CallLLMRetryTest(unittest.IsolatedAsyncioTestCase):
+    async def test_refused_connection_is_retried(self):
+        agent = LLMAgent(hosts=[f"http://127.0.0.1:{_closed_port()}"], max_retries=2)
+        client = agent.clients[0]
+        chat = mock.AsyncMock(wraps=client.chat)
+        try:
+            with mock.patch.object(client, "chat", chat), \
+                 mock.patch.object(llm_agent, "RETRY_BASE_DELAY", 0.0):
+                result = await agent.call_llm("system", "user", _Output)
+        finally:
+            await agent.aclose()
+
+        self.assertIsNone(result)
+        self.assertEqual(chat.await_count, agent.max_retries + 1)
+        self.assertEqual(agent._in_flight, [0])
+
+class CachingLLMAgentTest(unittest.IsolatedAsyncioTestCase):
+    async def test_rerun_replays_samples_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        db_threads = set()
+        real_get = CachingLLMAgent._db_get
+
+        def _db_get(agent, key, sample):
+            db_threads.add(threading.get_ident())
+            return real_get(agent, key, sample)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = Path(tmp) / "cache.sqlite"
+            fresh = mock.AsyncMock(side_effect=[_Output(text="a"), _Output(text="b")])
+            with mock.patch.object(LLMAgent, "call_llm", fresh), \
+                 mock.patch.object(CachingLLMAgent, "_db_get", _db_get):
+                agent = CachingLLMAgent(cache_path)
+                first = [await agent.call_llm("system", "user", _Output) for _ in range(2)]
+                await agent.aclose()
+
+                agent = CachingLLMAgent(cache_path)
+                replay = [await agent.call_llm("system", "user", _Output) for _ in range(2)]
+                await agent.aclose()
+
+        self.assertEqual([r.text for r in first], ["a", "b"])
+        self.assertEqual(replay, first)
+        self.assertEqual(fresh.await_count, 2) # The re-run never queried the server
+        self.assertNotIn(loop_thread, db_threads)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+# tests/test_setup.py
+import csv
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+from utils.setup import load_many_references, load_random_reference, seed_corpus_rng
+
+RECORDS = [
+    "first single-line record",
+    "multi\nline\nfield with three lines",
+    'a record with "quotes" inside',
+    "last single-line record",
+]
+
+class LoadRandomReferenceTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.corpus = Path(self._tmp.name) / "corpus.csv"
+        with open(self.corpus, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            for record in RECORDS:
+                writer.writerow([record])
+        seed_corpus_rng(0)
+
+    def tearDown(self):
+        seed_corpus_rng(None)
+        self._tmp.cleanup()
+
+    def test_multi_line_field_is_one_record(self):
+        draws = Counter(load_random_reference(str(self.corpus)) for _ in range(2000))
+
+        self.assertEqual(set(draws), set(RECORDS)) # No fragments of the quoted field
+        for record in RECORDS:
+            self.assertGreater(draws[record], 2000 / len(RECORDS) * 0.8)
+
+    def test_many_references_are_distinct_records(self):
+        self.assertEqual(sorted(load_many_references(len(RECORDS), str(self.corpus))), sorted(RECORDS))
+
+if __name__ == "__main__":
+    unittest.main()
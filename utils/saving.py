@@ -1,47 +1,76 @@
 # utils/saving.py
 import json
 import csv
+try:
+    import orjson # Optional fast JSON encoder
+except ImportError:
+    orjson = None
 from pathlib import Path
 from typing import List, Dict, Any
 from ga.genome import Individual
 
+def _write_json(data: Any, file_path: Path):
+    """
+    Writes 'data' as indented UTF-8 JSON, with orjson when it is installed.
+    Values JSON does not know (e.g. Path arguments) are written as strings.
+    """
+    if orjson is not None:
+        file_path.write_bytes(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2))
+        return
+
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+
 def save_population_to_json(population: List[Individual], file_path: Path):
     """
     Saves the list of individual dictionaries to a JSON file.
     """
     file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(population, f, indent=2, ensure_ascii=False)
+    _write_json(population, file_path)
 
-def append_metrics_to_csv(
-    output_dir: Path,
-    generation: int,
-    stats: Dict[str, Any],
-    duration_sec: float
-):
+class MetricsWriter:
     """
-    Appends a row of statistics to the metrics_log.csv file.
+    Appends rows of statistics to the metrics_log.csv file.
+    The file is opened once for the whole experiment and flushed after
+    every row, so each generation costs a write instead of an open/close.
     """
-    csv_path = output_dir / "metrics_log.csv"
-    file_exists = csv_path.exists()
-    
-    with open(csv_path, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        
+    HEADER = [
+        "generation", "count", "mean_fitness", "std_fitness",
+        "min_fitness", "max_fitness", "duration_sec"
+    ]
+
+    def __init__(self, output_dir: Path):
+        csv_path = output_dir / "metrics_log.csv"
+        file_exists = csv_path.exists()
+
+        self._file = open(csv_path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+
         # Write header only if the file is new
         if not file_exists:
-            writer.writerow([
-                "generation", "count", "mean_fitness", "std_fitness",
-                "min_fitness", "max_fitness", "duration_sec"
-            ])
-        
-        # Write data row
-        writer.writerow([
+            self._writer.writerow(self.HEADER)
+            self._file.flush()
+
+    def append(self, generation: int, stats: Dict[str, Any], duration_sec: float):
+        """
+        Writes the data row of one generation.
+        """
+        self._writer.writerow([
             generation, stats["count"],
             f"{stats['mean']:.6f}", f"{stats['std']:.6f}",
             f"{stats['min']:.6f}", f"{stats['max']:.6f}",
             f"{duration_sec:.6f}"
         ])
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "MetricsWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 def save_parameters_to_json(output_dir: Path, args: dict):
     """
@@ -63,7 +92,6 @@ def save_parameters_to_json(output_dir: Path, args: dict):
         del params_data['outdir_base']
         
     try:
-        with open(params_path, "w", encoding="utf-8") as f:
-            json.dump(params_data, f, indent=4, ensure_ascii=False)
+        _write_json(params_data, params_path)
     except Exception as e:
         print(f"Warning: parameters.json couldn't be saved: {e}")
\ No newline at end of file
@@ -1,28 +1,197 @@
 # utils/setup.py
 import random
 import csv
+import io
+import logging
+import mmap
+import os
+import queue
+import shutil
+import time
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Optional, Tuple
-from datetime import datetime
+from typing import List, Optional, Tuple, Union
+import numpy as np
 
-# Rutas de los corpus (actualizadas)
-CORPUS_FILE = Path("data/filtered_corpus.csv")
-EXAMPLE_CORPUS_FILE = Path("data/example_corpus.csv")
+# Rutas de los corpus (actualizadas), relative to the repository root so
+# they do not depend on the current working directory
+_REPO_DIR = Path(__file__).resolve().parent.parent
+CORPUS_FILE = _REPO_DIR / "data" / "filtered_corpus.csv"
+EXAMPLE_CORPUS_FILE = _REPO_DIR / "data" / "example_corpus.csv"
 
-def load_random_reference(corpus_arg: Optional[str] = None) -> str:
+# Whether the default corpora exist, checked once at import
+_CORPUS_EXISTS = CORPUS_FILE.exists()
+_EXAMPLE_CORPUS_EXISTS = EXAMPLE_CORPUS_FILE.exists()
+
+# Dedicated generator for corpus sampling, independent of the global
+# 'random' state used by the GA (see seed_corpus_rng)
+_rng = random.Random()
+
+# Blank records tolerated while sampling before falling back to parsing
+# the whole corpus
+MAX_SAMPLE_ATTEMPTS = 32
+
+def setup_logging(level: int = logging.WARNING) -> QueueListener:
     """
-    Loads a random line from the specified corpus or the default one.
+    Routes all log records through an in-memory queue: emitting a record
+    from the event loop only enqueues it, and a background thread writes
+    it to stderr. The caller must stop() the returned listener on exit.
+    """
+    log_queue: queue.Queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def seed_corpus_rng(seed: Optional[int] = None) -> None:
+    """
+    Seeds the generator used to sample reference texts from the corpus,
+    so a run's reference can be reproduced. None reseeds from OS entropy.
+    """
+    _rng.seed(seed)
+
+def _reservoir_lines(path_str: str, k: int) -> List[str]:
+    """
+    Picks up to 'k' distinct random non-empty lines of a corpus file in a
+    single streaming pass (reservoir sampling), without holding the parsed
+    corpus in memory. Returns every such line if the corpus has fewer.
     """
+    pool: List[str] = []
+    n = 0
+    with open(path_str, encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if row and row[0].strip():
+                n += 1
+                if n <= k:
+                    pool.append(row[0])
+                else:
+                    j = _rng.randrange(n) # Keep the n-th line with probability k/n
+                    if j < k:
+                        pool[j] = row[0]
+    _rng.shuffle(pool)
+    return pool
+
+def _scan_record_offsets(path_str: str) -> List[int]:
+    """
+    Returns the byte offsets where each CSV record of a corpus file starts,
+    found with csv.reader itself, so quoted fields spanning several lines
+    stay one record. Blank lines count as (empty) records.
+    """
+    offsets = [0]
+    pos = 0
+
+    def _lines():
+        nonlocal pos
+        for raw in f:
+            pos += len(raw)
+            yield raw.decode('utf-8')
+
+    with open(path_str, 'rb') as f:
+        # The reader pulls exactly the lines of one record before yielding it
+        for _ in csv.reader(_lines()):
+            offsets.append(pos)
+    return offsets
+
+@lru_cache(maxsize=8)
+def _record_offsets(path_str: str, mtime: float) -> np.ndarray:
+    """
+    Returns the byte offsets where each record of a corpus file starts, plus
+    the end of the file (record i spans offsets[i]:offsets[i + 1]).
+
+    The index is saved next to the corpus as '<corpus>.rec.idx.npy' and
+    reused (memory-mapped) by later runs while it is newer than the corpus
+    and ends at its current size. Memoized per path and modification time.
+    """
+    corpus_path = Path(path_str)
+    idx_path = Path(path_str + ".rec.idx.npy")
+    size = corpus_path.stat().st_size
+
+    if idx_path.exists() and idx_path.stat().st_mtime >= mtime:
+        offsets = np.load(idx_path, mmap_mode='r')
+        if len(offsets) and offsets[-1] == size:
+            return offsets
+
+    with open(path_str, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        has_quotes = mm.find(b'"') != -1
+        if not has_quotes:
+            # No quoted fields: every newline ends a record (one vectorized pass)
+            newlines = np.flatnonzero(np.frombuffer(mm, dtype=np.uint8) == 0x0A)
+            offsets = np.concatenate(([0], newlines + 1)).astype(np.uint64)
+            del newlines # Release the buffer export before the mmap closes
+    if has_quotes:
+        offsets = np.array(_scan_record_offsets(path_str), dtype=np.uint64)
+    if offsets[-1] != size:
+        offsets = np.append(offsets, np.uint64(size)) # Last record has no trailing newline
+
+    try:
+        tmp_path = Path(path_str + ".rec.idx.tmp.npy")
+        np.save(tmp_path, offsets)
+        os.replace(tmp_path, idx_path)
+    except OSError:
+        pass # Read-only location: keep the index in memory only
+    return offsets
+
+def _sample_lines(path_str: str, mtime: float, k: int) -> List[str]:
+    """
+    Picks up to 'k' distinct random non-empty records of a corpus file by
+    reading only those records from a memory map. Blank records are skipped;
+    at most MAX_SAMPLE_ATTEMPTS of them are tolerated, so fewer than 'k'
+    lines may be returned.
+    """
+    offsets = _record_offsets(path_str, mtime)
+    n_records = len(offsets) - 1
+    lines: List[str] = []
+
+    with open(path_str, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mm, 'madvise'):
+            mm.madvise(mmap.MADV_RANDOM) # A few scattered records per call: no read-ahead
+
+        for i in _rng.sample(range(n_records), min(n_records, k + MAX_SAMPLE_ATTEMPTS)):
+            raw = mm[int(offsets[i]):int(offsets[i + 1])]
+            if not raw.strip():
+                continue # Blank record: skip it without decoding
+            line = raw.decode('utf-8')
+            if '"' in line:
+                row = next(csv.reader(io.StringIO(line, newline='')), [])
+                line = row[0] if row else ''
+            else:
+                line = line.rstrip('\r\n')
+            if line.strip():
+                lines.append(line)
+                if len(lines) == k:
+                    break
+
+    return lines
+
+def load_many_references(k: int, corpus_arg: Optional[str] = None) -> List[str]:
+    """
+    Loads 'k' random lines from the specified corpus or the default one,
+    opening it once. Lines are distinct unless the corpus has fewer than
+    'k' of them, in which case they are drawn with replacement.
+    """
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}.")
+
+    # Default corpus: already absolute and checked at import, so no syscall
     file_to_load = CORPUS_FILE
+    file_exists = _CORPUS_EXISTS
     
     if corpus_arg:
-        file_to_load = Path(corpus_arg)
+        file_to_load = Path(corpus_arg).resolve()
+        file_exists = file_to_load.exists()
     
-    if not file_to_load.exists():
+    if not file_exists:
         if corpus_arg:
             print(f"Warning: Specified corpus '{corpus_arg}' not found.")
         
-        if EXAMPLE_CORPUS_FILE.exists():
+        if _EXAMPLE_CORPUS_EXISTS:
             print(f"Warning: Using '{EXAMPLE_CORPUS_FILE}' as fallback.")
             file_to_load = EXAMPLE_CORPUS_FILE
         else:
@@ -31,46 +200,98 @@ def load_random_reference(corpus_arg: Optional[str] = None) -> str:
                 "Please run 'python prepare_corpus.py' or add 'data/example_corpus.csv'."
             )
             
-    # Read CSV file
-    with open(file_to_load, mode='r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        lines = [row[0] for row in reader if row and row[0].strip()]
+    path_str = str(file_to_load)
+    stat = file_to_load.stat()
+    if stat.st_size == 0:
+        raise ValueError(f"Corpus file '{file_to_load}' is empty.")
+
+    # Read only the sampled lines from the memory-mapped file
+    lines = _sample_lines(path_str, stat.st_mtime, k)
+    if len(lines) == k:
+        return lines
+
+    # Mostly blank or small corpus: stream it through the csv parser
+    lines = _reservoir_lines(path_str, k)
     
     if not lines:
         raise ValueError(f"Corpus file '{file_to_load}' is empty.")
     
-    return random.choice(lines)
+    if len(lines) < k:
+        return _rng.choices(lines, k=k)
+    return lines
+
+def load_random_reference(corpus_arg: Optional[str] = None) -> str:
+    """
+    Loads a random line from the specified corpus or the default one.
+    """
+    return load_many_references(1, corpus_arg)[0]
+
+def _write_bytes(path: str, data: bytes) -> None:
+    """
+    Writes pre-encoded bytes with raw os-level calls (no text/buffer layers).
+    The bytes go to a temporary file that is then renamed over 'path', so
+    readers never see a partially written file.
+    """
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
 
 def setup_experiment(
     base_dir: Path,
-    reference_text_arg: Optional[str] = None
-) -> Tuple[Path, str]:
+    reference_text_arg: Optional[str] = None,
+    as_bytes: bool = False
+) -> Tuple[Path, Union[str, bytes]]:
     """
     Prepares the environment for a single GA run.
     1. Creates a unique timestamped directory inside 'base_dir'.
     2. Loads the reference text.
     3. Saves a copy of the reference text inside the new directory.
+    With 'as_bytes', the reference text is returned as UTF-8 bytes, skipping
+    the decode of a reference file (stripped of ASCII whitespace only).
     (Adapted from)
     """
     
-    # 1. Create unique output directory
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    # 1. Create unique output directory. Runs started within the same second
+    # (e.g. batched sweeps) get a '_<n>' suffix instead of sharing a directory.
+    timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+    base_dir.mkdir(parents=True, exist_ok=True)
     output_dir = base_dir / timestamp
-    output_dir.mkdir(parents=True, exist_ok=True)
+    n = 0
+    while True:
+        try:
+            output_dir.mkdir(exist_ok=False)
+            break
+        except FileExistsError:
+            n += 1
+            output_dir = base_dir / f"{timestamp}_{n}"
 
-    # 2. Load reference text
-    reference_text = ""
+    # 2. Load the reference text and 3. save a copy of it in the output directory
+    ref_save_path = os.path.join(os.fspath(output_dir), "reference_text.txt")
     if reference_text_arg:
         p_ref = Path(reference_text_arg)
         if not p_ref.exists():
             raise FileNotFoundError(f"Specified reference file not found: {reference_text_arg}")
+        # Kernel-side copy (sendfile on Linux) of the file as given, renamed
+        # into place once complete. Not a hardlink: later edits to the source
+        # must not alter the run's record.
+        tmp_path = f"{ref_save_path}.tmp"
+        shutil.copyfile(p_ref, tmp_path)
+        os.replace(tmp_path, ref_save_path)
+        if as_bytes:
+            return output_dir, p_ref.read_bytes().strip()
         reference_text = p_ref.read_text(encoding="utf-8").strip()
     else:
         # Load a random one from the corpus
         reference_text = load_random_reference()
-    
-    # 3. Save the reference text to the output directory
-    ref_save_path = output_dir / "reference_text.txt"
-    ref_save_path.write_text(reference_text, encoding="utf-8")
-    
+        data = reference_text.encode("utf-8")
+        _write_bytes(ref_save_path, data)
+        if as_bytes:
+            return output_dir, data
+
     return output_dir, reference_text
\ No newline at end of file